@@ -0,0 +1,62 @@
+import random
+import sys
+import time
+
+from minesweeper import Minesweeper, MinesweeperAI, BitsetMinesweeperAI
+
+HEIGHT = 30
+WIDTH = 30
+MINES = 40
+GAMES = 5
+
+
+def main():
+    if len(sys.argv) not in [1, 4]:
+        sys.exit("Usage: python benchmark.py [height width mines]")
+    height, width, mines = (
+        map(int, sys.argv[1:]) if len(sys.argv) == 4
+        else (HEIGHT, WIDTH, MINES)
+    )
+
+    print(f"Board {height}x{width} with {mines} mines, {GAMES} games")
+    configurations = [
+        ("add_knowledge", MinesweeperAI, False),
+        ("add_knowledge_batch", MinesweeperAI, True),
+        ("add_knowledge_batch (bitset)", BitsetMinesweeperAI, True)
+    ]
+    for name, ai_class, batch in configurations:
+        elapsed = 0
+        for seed in range(GAMES):
+            elapsed += play_game(ai_class, height, width, mines, seed, batch)
+        print(f"  {name}: {elapsed / GAMES:.4f}s AI time per game")
+
+
+def play_game(ai_class, height, width, mines, seed, batch):
+    """
+    Play a game with the AI until it wins, loses or runs out of moves.
+    Return the total time spent inside the AI's knowledge updates.
+    """
+    random.seed(seed)
+    game = Minesweeper(height=height, width=width, mines=mines)
+    ai = ai_class(height=height, width=width)
+
+    elapsed = 0
+    while True:
+        move = ai.make_safe_move()
+        if move is None:
+            move = ai.make_random_move()
+        if move is None or game.is_mine(move):
+            return elapsed
+
+        revealed = game.reveal(move)
+        start = time.perf_counter()
+        if batch:
+            ai.add_knowledge_batch(revealed)
+        else:
+            for cell, count in revealed:
+                ai.add_knowledge(cell, count)
+        elapsed += time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    main()
@@ -29,8 +29,9 @@ class Minesweeper():
                 self.mines.add((i, j))
                 self.board[i][j] = True
 
-        # At first, player has found no mines
+        # At first, player has found no mines and revealed no cells
         self.mines_found = set()
+        self.revealed = set()
 
     def print(self):
         """
@@ -76,6 +77,37 @@ class Minesweeper():
 
         return count
 
+    def reveal(self, cell):
+        """
+        Reveals a safe cell, flood filling outwards from any revealed
+        cell with no nearby mines.
+        Returns a list of `(cell, count)` pairs for every newly revealed
+        cell, where `count` is the number of mines near that cell.
+        """
+        revealed = []
+        if cell in self.revealed or self.is_mine(cell):
+            return revealed
+
+        # Iterative flood fill, so large empty regions can't overflow the stack
+        frontier = [cell]
+        self.revealed.add(cell)
+        while frontier:
+            current = frontier.pop()
+            count = self.nearby_mines(current)
+            revealed.append((current, count))
+            if count != 0:
+                continue
+
+            # No nearby mines, so every neighbor is safe to reveal too
+            for i in range(current[0] - 1, current[0] + 2):
+                for j in range(current[1] - 1, current[1] + 2):
+                    if 0 <= i < self.height and 0 <= j < self.width:
+                        if (i, j) not in self.revealed:
+                            self.revealed.add((i, j))
+                            frontier.append((i, j))
+
+        return revealed
+
     def won(self):
         """
         Checks if all mines have been flagged.
@@ -134,6 +166,90 @@ class Sentence():
             self.cells.remove(cell)
 
 
+class BitSentence():
+    """
+    Logical statement about a Minesweeper game, with its cells encoded
+    as an integer bitmask where cell (i, j) is bit i * width + j.
+    Subset, difference and equality tests are single integer operations.
+    """
+
+    __slots__ = ("mask", "count", "width")
+
+    def __init__(self, cells, count, width):
+        self.mask = 0
+        for i, j in cells:
+            self.mask |= 1 << (i * width + j)
+        self.count = count
+        self.width = width
+
+    @classmethod
+    def from_mask(cls, mask, count, width):
+        sentence = cls((), count, width)
+        sentence.mask = mask
+        return sentence
+
+    @property
+    def cells(self):
+        """
+        Returns the set of cells encoded in self.mask.
+        """
+        cells = set()
+        mask = self.mask
+        while mask:
+            low_bit = mask & -mask
+            cells.add(divmod(low_bit.bit_length() - 1, self.width))
+            mask ^= low_bit
+        return cells
+
+    def __eq__(self, other):
+        return self.mask == other.mask and self.count == other.count
+
+    def __hash__(self):
+        return hash((self.mask, self.count))
+
+    def __str__(self):
+        return f"{self.cells} = {self.count}"
+
+    def bit(self, cell):
+        i, j = cell
+        return 1 << (i * self.width + j)
+
+    def known_mines(self):
+        """
+        Returns the set of all cells in self.cells known to be mines.
+        """
+        if self.mask.bit_count() == self.count:
+            return self.cells
+        return set()
+
+    def known_safes(self):
+        """
+        Returns the set of all cells in self.cells known to be safe.
+        """
+        if self.count == 0:
+            return self.cells
+        return set()
+
+    def mark_mine(self, cell):
+        """
+        Updates internal knowledge representation given the fact that
+        a cell is known to be a mine.
+        """
+        bit = self.bit(cell)
+        if self.mask & bit:
+            self.mask ^= bit
+            self.count -= 1
+
+    def mark_safe(self, cell):
+        """
+        Updates internal knowledge representation given the fact that
+        a cell is known to be safe.
+        """
+        bit = self.bit(cell)
+        if self.mask & bit:
+            self.mask ^= bit
+
+
 class MinesweeperAI():
     """
     Minesweeper game player
@@ -188,13 +304,26 @@ class MinesweeperAI():
             5) add any new sentences to the AI's knowledge base
                if they can be inferred from existing knowledge
         """
-        self.moves_made.add(cell)
-        self.mark_safe(cell)
+        self.add_knowledge_batch([(cell, count)])
 
-        new_sentence = Sentence(cells=self.get_nearby_cells(cell), count=count)
-        [new_sentence.mark_safe(cell) for cell in self.safes]
-        [new_sentence.mark_mine(cell) for cell in self.mines]
-        self.knowledge.append(new_sentence)
+    def add_knowledge_batch(self, revealed):
+        """
+        Adds knowledge for every `(cell, count)` pair in `revealed`,
+        e.g. as returned by `Minesweeper.reveal`, and then runs
+        inference over the knowledge base only once.
+        """
+        for cell, _ in revealed:
+            self.moves_made.add(cell)
+            self.mark_safe(cell)
+
+        for cell, count in revealed:
+            # Leave out cells whose state is already known
+            nearby_cells = self.get_nearby_cells(cell) - self.safes
+            nearby_mines = nearby_cells & self.mines
+            unknown_cells = nearby_cells - nearby_mines
+            if unknown_cells:
+                new_sentence = self.make_sentence(cells=unknown_cells, count=count - len(nearby_mines))
+                self.knowledge.append(new_sentence)
 
         self.update_knowledge()
 
@@ -208,6 +337,12 @@ class MinesweeperAI():
 
         self.update_knowledge()
 
+    def make_sentence(self, cells, count):
+        """
+        Returns a new sentence stating that `count` of `cells` are mines.
+        """
+        return Sentence(cells=cells, count=count)
+
     def update_knowledge(self):
         repeat = False
 
@@ -234,12 +369,7 @@ class MinesweeperAI():
             self.update_knowledge()
 
     def remove_empty_sentences(self):
-        empty_sentences = []
-        for sentence in self.knowledge:
-            if len(sentence.cells) == 0:
-                empty_sentences.append(sentence)
-
-        [self.knowledge.remove(sentence) for sentence in empty_sentences]
+        self.knowledge = [sentence for sentence in self.knowledge if len(sentence.cells) != 0]
 
     def make_safe_move(self):
 
@@ -281,3 +411,58 @@ class MinesweeperAI():
                     nearby_cells.add((i, j))
 
         return nearby_cells
+
+
+class BitsetMinesweeperAI(MinesweeperAI):
+    """
+    Minesweeper game player whose knowledge base is made of
+    bitmask-encoded sentences.
+    """
+
+    def make_sentence(self, cells, count):
+        return BitSentence(cells=cells, count=count, width=self.width)
+
+    def mark_mine(self, cell):
+        self.mines.add(cell)
+        bit = 1 << (cell[0] * self.width + cell[1])
+        for sentence in self.knowledge:
+            if sentence.mask & bit:
+                sentence.mask ^= bit
+                sentence.count -= 1
+
+    def mark_safe(self, cell):
+        self.safes.add(cell)
+        bit = 1 << (cell[0] * self.width + cell[1])
+        for sentence in self.knowledge:
+            if sentence.mask & bit:
+                sentence.mask ^= bit
+
+    def update_knowledge(self):
+        repeat = True
+
+        while repeat:
+            repeat = False
+            seen = set(self.knowledge)
+
+            for sentence1, sentence2 in zip(self.knowledge[0::2], self.knowledge[1::2]):
+                mask1 = sentence1.mask
+                mask2 = sentence2.mask
+                if mask1 == mask2:
+                    continue
+                elif mask1 & mask2 == mask1:
+                    diff = mask2 ^ mask1
+                elif mask1 & mask2 == mask2:
+                    diff = mask1 ^ mask2
+                else:
+                    continue
+
+                new_sentence = BitSentence.from_mask(diff, abs(sentence1.count - sentence2.count), self.width)
+                if new_sentence not in seen:
+                    seen.add(new_sentence)
+                    self.knowledge.append(new_sentence)
+                    repeat = True
+
+            self.remove_empty_sentences()
+
+    def remove_empty_sentences(self):
+        self.knowledge = [sentence for sentence in self.knowledge if sentence.mask]
@@ -216,8 +216,8 @@ while True:
         if game.is_mine(move):
             lost = True
         else:
-            nearby = game.nearby_mines(move)
-            revealed.add(move)
-            ai.add_knowledge(move, nearby)
+            newly_revealed = game.reveal(move)
+            revealed.update(cell for cell, _ in newly_revealed)
+            ai.add_knowledge_batch(newly_revealed)
 
     pygame.display.flip()
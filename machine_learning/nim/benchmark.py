@@ -0,0 +1,285 @@
+import contextlib
+import io
+import itertools
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from nim import Nim, NimAI, train
+from vectorized import train_vectorized
+
+INITIAL = [1, 3, 5, 7]
+TRAINING_GAMES = 10000
+EVALUATION_GAMES = 1000
+ENCODING_PILES = [[1, 3, 5, 7], [3, 5, 7, 9], [2, 4, 6, 8, 10], [3, 5, 7, 9, 11]]
+LATENCY_MOVES = 10000
+WORKER_COUNTS = [1, 2, 4, 8]
+WORKER_PILES = [3, 5, 7, 9]
+WORKER_GAMES = 40000
+SNAPSHOT_INTERVAL = 1
+CHART_WIDTH = 40
+CHECKPOINT_PILES = [[1, 3, 5, 7], [3, 5, 7, 9, 11], [3, 5, 7, 9, 11, 13]]
+
+
+def main():
+    if len(sys.argv) > 2:
+        sys.exit("Usage: python benchmark.py [games]")
+    n = int(sys.argv[1]) if len(sys.argv) == 2 else TRAINING_GAMES
+    benchmark_training(n)
+    benchmark_encoding(ENCODING_PILES)
+    benchmark_workers(WORKER_COUNTS)
+    benchmark_checkpoints(CHECKPOINT_PILES)
+
+
+class DictNimAI():
+
+    def __init__(self, q):
+        """
+        Initialize an AI that looks up Q-values in a dictionary `q` keyed
+        by `(tuple(state), action)`, the way NimAI used to, to compare
+        with its Q-value array.
+        """
+        self.q = q
+
+    def get_q_value(self, state, action):
+        if self.q and (tuple(state), action) in self.q:
+            return self.q[(tuple(state), action)]
+        else:
+            return 0
+
+    def choose_action(self, state, epsilon=False):
+        available_actions = Nim.available_actions(state)
+        max_reward = 0
+        max_reward_action = None
+        for action in available_actions:
+            if max_reward_action is None or self.get_q_value(state, action) > max_reward:
+                max_reward = self.get_q_value(state, action)
+                max_reward_action = action
+        return max_reward_action
+
+
+def winning_actions(piles):
+    """
+    Return a list of the actions in `piles` that leave the other player
+    in a losing position, where whoever takes the last object loses.
+
+    Like ordinary Nim, a position is lost if the nim-sum of the piles is
+    0, unless no pile has more than one object, when it is lost if an
+    odd number of piles have one object.
+    """
+    actions = []
+    for i, j in Nim.available_actions(piles):
+        after = piles.copy()
+        after[i] -= j
+        if is_lost(after):
+            actions.append((i, j))
+    return actions
+
+
+def is_lost(piles):
+    """
+    Return whether the player to move in `piles` loses with best play.
+    """
+    if all(pile <= 1 for pile in piles):
+        return sum(piles) % 2 == 1
+    nim_sum = 0
+    for pile in piles:
+        nim_sum ^= pile
+    return nim_sum == 0
+
+
+def optimal_move_rate(ai, initial=INITIAL):
+    """
+    Return the fraction of pile configurations with a winning action in
+    which `ai` chooses one.
+    """
+    winnable = 0
+    chosen = 0
+    for piles in itertools.product(*(range(pile + 1) for pile in initial)):
+        piles = list(piles)
+        actions = winning_actions(piles)
+        if actions:
+            winnable += 1
+            chosen += ai.choose_action(piles, epsilon=False) in actions
+    return chosen / winnable
+
+
+def optimal_win_rate(ai, initial=INITIAL, games=EVALUATION_GAMES, seed=0):
+    """
+    Return the fraction of `games` games that `ai` wins against a player
+    who always chooses a random winning action if there is one, and a
+    random action otherwise. The AI moves first in every other game.
+    """
+    rng = random.Random(seed)
+    wins = 0
+    for k in range(games):
+        game = Nim(initial)
+        ai_player = k % 2
+        while game.winner is None:
+            if game.player == ai_player:
+                action = ai.choose_action(game.piles, epsilon=False)
+            else:
+                actions = winning_actions(game.piles) or sorted(Nim.available_actions(game.piles))
+                action = rng.choice(actions)
+            game.move(action)
+        wins += game.winner == ai_player
+    return wins / games
+
+
+def benchmark_training(n, initial=INITIAL):
+    """
+    Time training on `n` games with `train`, then with `train_vectorized`
+    on twice as many games each time until its AI chooses winning actions
+    as often as the one `train` trained.
+    """
+    print(f"Training on {n} games of {initial}")
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        ai = train(n)
+    baseline = time.perf_counter() - start
+    quality = optimal_move_rate(ai, initial)
+    print(
+        f"  train, {n} games: {baseline:.3f}s, {n / baseline:.0f} games per second, "
+        f"optimal moves {quality:.1%}, "
+        f"wins against optimal play {optimal_win_rate(ai, initial):.1%}"
+    )
+
+    games = n
+    while True:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            ai = train_vectorized(games, initial, report=None, seed=0)
+        elapsed = time.perf_counter() - start
+        rate = optimal_move_rate(ai, initial)
+        print(
+            f"  train_vectorized, {games} games: {elapsed:.3f}s, "
+            f"{games / elapsed:.0f} games per second, optimal moves {rate:.1%}, "
+            f"wins against optimal play {optimal_win_rate(ai, initial):.1%}"
+        )
+        if rate >= quality:
+            break
+        games *= 2
+    print(
+        f"  Same quality {baseline / elapsed:.1f}x faster, "
+        f"{games / elapsed / (n / baseline):.1f}x more games per second"
+    )
+
+
+def benchmark_encoding(piles, seed=0):
+    """
+    For each of the initial `piles`, compare the memory used by a Q-value
+    for every legal action in a dictionary and in a NimAI's array, and
+    how long choosing the best action in a random configuration takes.
+    """
+    rng = random.Random(seed)
+    print("Q-value tables")
+    for initial in piles:
+        tracemalloc.start()
+        ai = NimAI(initial=initial)
+        ai.q[:] = [rng.random() for _ in range(len(ai.q))]
+        array_memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        tracemalloc.start()
+        q = dict()
+        for configuration in itertools.product(*(range(pile + 1) for pile in initial)):
+            for action in Nim.available_actions(configuration):
+                q[(configuration, action)] = rng.random()
+        dict_ai = DictNimAI(q)
+        dict_memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        configurations = [
+            [rng.randint(0, pile) for pile in initial] for _ in range(LATENCY_MOVES)
+        ]
+        latencies = []
+        for player in [dict_ai, ai]:
+            start = time.perf_counter()
+            for configuration in configurations:
+                if any(configuration):
+                    player.choose_action(configuration, epsilon=False)
+            latencies.append((time.perf_counter() - start) / len(configurations))
+
+        print(
+            f"  {initial}: {len(ai.q)} Q-values, "
+            f"dict {dict_memory / 2 ** 20:.1f} MiB and {latencies[0] * 1e6:.1f} us per move, "
+            f"array {array_memory / 2 ** 20:.1f} MiB and {latencies[1] * 1e6:.1f} us per move"
+        )
+
+
+def benchmark_workers(counts, n=WORKER_GAMES, initial=WORKER_PILES,
+                      interval=SNAPSHOT_INTERVAL):
+    """
+    Train on `n` games of `initial` with each number of worker processes
+    in `counts`, and chart the win rate against optimal play of a
+    snapshot of the AI taken every `interval` seconds, and how often it
+    chooses a winning action.
+    """
+    print(f"Training on {n} games of {initial} with worker processes")
+    for workers in counts:
+        snapshots = []
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            ai = train(
+                n, initial, workers,
+                lambda elapsed, games, ai: snapshots.append((elapsed, games, ai)),
+                interval
+            )
+        elapsed = time.perf_counter() - start
+        snapshots.append((elapsed, n, ai))
+
+        print(f"  {workers} workers: {elapsed:.3f}s, {n / elapsed:.0f} games per second")
+        for elapsed, games, ai in snapshots:
+            rate = optimal_win_rate(ai, initial)
+            print(
+                f"    {elapsed:6.2f}s {games:7d} games "
+                f"{'#' * round(rate * CHART_WIDTH):<{CHART_WIDTH}} {rate:.1%}, "
+                f"optimal moves {optimal_move_rate(ai, initial):.1%}"
+            )
+
+
+def benchmark_checkpoints(piles, seed=0):
+    """
+    For each of the initial `piles`, time saving a NimAI with random
+    Q-values, loading it again, and choosing its first move, compared
+    with building a new NimAI for the same piles.
+    """
+    rng = np.random.default_rng(seed)
+    print("Q-table checkpoints")
+    with tempfile.TemporaryDirectory() as directory:
+        for initial in piles:
+            start = time.perf_counter()
+            ai = NimAI(initial=initial)
+            build = time.perf_counter() - start
+            ai.q[:] = rng.random(len(ai.q))
+
+            filename = os.path.join(directory, "nim.qtable")
+            start = time.perf_counter()
+            ai.save(filename)
+            save = time.perf_counter() - start
+
+            start = time.perf_counter()
+            loaded = NimAI.load(filename)
+            load = time.perf_counter() - start
+            start = time.perf_counter()
+            action = loaded.choose_action(initial, epsilon=False)
+            first_move = time.perf_counter() - start
+            if action != ai.choose_action(initial, epsilon=False):
+                raise AssertionError(f"loaded AI chose {action} in {initial}")
+
+            print(
+                f"  {initial}: {len(ai.q)} Q-values, "
+                f"{os.path.getsize(filename) / 2 ** 20:.1f} MiB, "
+                f"new AI {build * 1000:.1f} ms, save {save * 1000:.1f} ms, "
+                f"load {load * 1000:.2f} ms, first move {first_move * 1000:.2f} ms"
+            )
+            del loaded
+
+
+if __name__ == "__main__":
+    main()
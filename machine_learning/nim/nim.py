@@ -1,5 +1,17 @@
+import copy
+import json
+import multiprocessing
+import multiprocessing.connection
+import os
 import random
 import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from states import PileStates
+
+SNAPSHOT_INTERVAL = 1
 
 
 class Nim():
@@ -71,19 +83,94 @@ class Nim():
 
 class NimAI():
 
-    def __init__(self, alpha=0.5, epsilon=0.1):
+    MAGIC = b"NIM-QTABLE-1\n"
+
+    def __init__(self, alpha=0.5, epsilon=0.1, initial=[1, 3, 5, 7]):
         """
-        Initialize AI with an empty Q-learning dictionary,
+        Initialize AI with an empty Q-learning table,
         an alpha (learning) rate, and an epsilon rate.
 
-        The Q-learning dictionary maps `(state, action)`
-        pairs to a Q-value (a number).
-         - `state` is a tuple of remaining piles, e.g. (1, 1, 4, 4)
+        The Q-learning table `q` is an array with a Q-value (a number)
+        for every `(state, action)` pair of a game starting from the
+        piles `initial`, numbered by `PileStates`.
+         - `state` is a list of remaining piles, e.g. [1, 1, 4, 4]
          - `action` is a tuple `(i, j)` for an action
+
+        `games` counts the training games the AI has played.
         """
-        self.q = dict()
+        self.states = PileStates(initial)
+        self.q = np.zeros(len(self.states.moves))
         self.alpha = alpha
         self.epsilon = epsilon
+        self.games = 0
+
+    def save(self, filename):
+        """
+        Write the AI to `filename`, so that it can be loaded again with
+        `NimAI.load` to play or to continue training.
+
+        The file holds `NimAI.MAGIC`, the length of a JSON header as an
+        8-byte little-endian integer, the header (with the initial piles,
+        `alpha`, `epsilon` and the number of training games), padding to a
+        multiple of 8 bytes, and then the Q-values as little-endian float64,
+        the `offsets` of the states as little-endian int64 and their legal
+        `moves` as little-endian int32. The file is written under a
+        temporary name and then renamed, so that a checkpoint is never left
+        half written, and an AI loaded from `filename` keeps its memory map.
+        """
+        header = json.dumps({
+            "initial": self.states.initial,
+            "alpha": self.alpha,
+            "epsilon": self.epsilon,
+            "games": self.games,
+            "states": len(self.states),
+            "entries": len(self.q)
+        }).encode()
+        header += b" " * (-(len(NimAI.MAGIC) + 8 + len(header)) % 8)
+        temporary = f"{filename}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(NimAI.MAGIC)
+            f.write(len(header).to_bytes(8, "little"))
+            f.write(header)
+            f.write(np.asarray(self.q, dtype="<f8").tobytes())
+            f.write(np.asarray(self.states.offsets, dtype="<i8").tobytes())
+            f.write(np.asarray(self.states.moves, dtype="<i4").tobytes())
+        os.replace(temporary, filename)
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Load an AI written by `NimAI.save`.
+
+        The Q-values and the tables of legal moves are memory maps of the
+        file rather than being read or computed, so loading takes about as
+        long for any size of table. The Q-values are mapped copy-on-write,
+        so training the AI further doesn't change the file until it is
+        saved again.
+        """
+        with open(filename, "rb") as f:
+            if f.read(len(cls.MAGIC)) != cls.MAGIC:
+                raise ValueError(f"{filename} is not a Nim Q-table")
+            size = int.from_bytes(f.read(8), "little")
+            header = json.loads(f.read(size))
+        start = len(cls.MAGIC) + 8 + size
+        entries = header["entries"]
+        offsets_start = start + 8 * entries
+
+        player = cls.__new__(cls)
+        player.states = PileStates(
+            header["initial"],
+            np.memmap(filename, dtype="<i8", mode="r", offset=offsets_start,
+                      shape=(header["states"] + 1,)),
+            np.memmap(filename, dtype="<i4", mode="r",
+                      offset=offsets_start + 8 * (header["states"] + 1),
+                      shape=(entries,))
+        )
+        player.q = np.memmap(filename, dtype="<f8", mode="c", offset=start, shape=(entries,))
+        player.alpha = header["alpha"]
+        player.epsilon = header["epsilon"]
+        player.games = header["games"]
+        return player
 
     def update(self, old_state, action, new_state, reward):
         """
@@ -98,12 +185,9 @@ class NimAI():
     def get_q_value(self, state, action):
         """
         Return the Q-value for the state `state` and the action `action`.
-        If no Q-value exists yet in `self.q`, return 0.
+        If no Q-value has been learned yet, return 0.
         """
-        if self.q and (tuple(state), action) in self.q:
-            return self.q[(tuple(state), action)]
-        else:
-            return 0
+        return self.q[self.states.move(state, action)]
 
     def update_q_value(self, state, action, old_q, reward, future_rewards):
         """
@@ -120,7 +204,7 @@ class NimAI():
         `alpha` is the learning rate, and `new value estimate`
         is the sum of the current reward and estimated future rewards.
         """
-        self.q[(tuple(state), action)] = old_q + self.alpha * (reward + future_rewards - old_q)
+        self.q[self.states.move(state, action)] = old_q + self.alpha * (reward + future_rewards - old_q)
 
     def best_future_reward(self, state):
         """
@@ -129,7 +213,7 @@ class NimAI():
         of their Q-values.
 
         Use 0 as the Q-value if a `(state, action)` pair has no
-        Q-value in `self.q`. If there are no available actions in
+        Q-value learned yet. If there are no available actions in
         `state`, return 0.
         """
         return self.best_action(state)[1]
@@ -154,74 +238,73 @@ class NimAI():
             chose_best = 0
             choice = random.choices([chose_random, chose_best], (self.epsilon, 1 - self.epsilon))
             if choice == chose_random:
-                return random.choice(list(Nim.available_actions(state)))
+                start, end = self.legal_moves(state)
+                return self.states.actions[self.states.moves[random.randrange(start, end)]]
 
         return self.best_action(state)[0]
 
     def best_action(self, state):
-        available_actions = Nim.available_actions(state)
-        max_reward = 0
-        max_reward_action = None
-        for action in available_actions:
-            if max_reward_action is None or self.get_q_value(state, action) > max_reward:
-                max_reward = self.get_q_value(state, action)
-                max_reward_action = action
+        """
+        Return a tuple `(action, q)` of the action with the highest Q-value
+        in `state` and its Q-value, or `(0, 0)` if there are no actions.
+        """
+        start, end = self.legal_moves(state)
+        if start == end:
+            return (0, 0)
+        best = start + int(self.q[start:end].argmax())
+        return self.states.actions[self.states.moves[best]], self.q[best]
 
-        return (max_reward_action, max_reward) if max_reward_action else (0, 0)
+    def copy(self, q=None):
+        """
+        Return a copy of the AI, with the Q-values `q` if given.
+        """
+        player = copy.copy(self)
+        player.q = np.array(self.q if q is None else q)
+        return player
 
+    def legal_moves(self, state):
+        """
+        Return a tuple `(start, end)` of the range of `self.q` holding the
+        Q-values of the actions available in `state`.
+        """
+        number = self.states.encode(state)
+        return int(self.states.offsets[number]), int(self.states.offsets[number + 1])
 
-def train(n):
+
+def train(n, initial=[1, 3, 5, 7], workers=1, snapshot=None,
+          snapshot_interval=SNAPSHOT_INTERVAL, player=None):
     """
-    Train an AI by playing `n` games against itself.
+    Train an AI by playing `n` games against itself,
+    starting from the piles `initial`.
+
+    If `player` is given, such as an AI loaded from a checkpoint, it is
+    trained further on its own initial piles instead of a new AI.
+
+    With more than one worker, the games are split between `workers`
+    processes that update a Q-table in shared memory without any
+    locking. If `snapshot` is given, it is called about every
+    `snapshot_interval` seconds with the time since training started,
+    the number of games played so far and a copy of the AI.
     """
+    if player is None:
+        player = NimAI(initial=initial)
+    initial = player.states.initial
+    if workers > 1:
+        return train_workers(player, n, workers, snapshot, snapshot_interval)
 
-    player = NimAI()
+    start = time.perf_counter()
+    next_snapshot = snapshot_interval
 
     # Play n games
     for i in range(n):
         print(f"Playing training game {i + 1}")
-        game = Nim()
-
-        # Keep track of last move made by either player
-        last = {
-            0: {"state": None, "action": None},
-            1: {"state": None, "action": None}
-        }
-
-        # Game loop
-        while True:
-
-            # Keep track of current state and action
-            state = game.piles.copy()
-            action = player.choose_action(game.piles)
-
-            # Keep track of last state and action
-            last[game.player]["state"] = state
-            last[game.player]["action"] = action
-
-            # Make move
-            game.move(action)
-            new_state = game.piles.copy()
-
-            # When game is over, update Q values with rewards
-            if game.winner is not None:
-                player.update(state, action, new_state, -1)
-                player.update(
-                    last[game.player]["state"],
-                    last[game.player]["action"],
-                    new_state,
-                    1
-                )
-                break
-
-            # If game is continuing, no rewards yet
-            elif last[game.player]["state"] is not None:
-                player.update(
-                    last[game.player]["state"],
-                    last[game.player]["action"],
-                    new_state,
-                    0
-                )
+        train_game(player, initial)
+        player.games += 1
+
+        elapsed = time.perf_counter() - start
+        if snapshot is not None and elapsed >= next_snapshot:
+            snapshot(elapsed, i + 1, player.copy())
+            next_snapshot += snapshot_interval
 
     print("Done training")
 
@@ -229,6 +312,126 @@ def train(n):
     return player
 
 
+def train_game(player, initial):
+    """
+    Play a game starting from the piles `initial` with `player` playing
+    against itself, and update its Q-values from every move.
+    """
+    game = Nim(initial)
+
+    # Keep track of last move made by either player
+    last = {
+        0: {"state": None, "action": None},
+        1: {"state": None, "action": None}
+    }
+
+    # Game loop
+    while True:
+
+        # Keep track of current state and action
+        state = game.piles.copy()
+        action = player.choose_action(game.piles)
+
+        # Keep track of last state and action
+        last[game.player]["state"] = state
+        last[game.player]["action"] = action
+
+        # Make move
+        game.move(action)
+        new_state = game.piles.copy()
+
+        # When game is over, update Q values with rewards
+        if game.winner is not None:
+            player.update(state, action, new_state, -1)
+            player.update(
+                last[game.player]["state"],
+                last[game.player]["action"],
+                new_state,
+                1
+            )
+            return
+
+        # If game is continuing, no rewards yet
+        elif last[game.player]["state"] is not None:
+            player.update(
+                last[game.player]["state"],
+                last[game.player]["action"],
+                new_state,
+                0
+            )
+
+
+def train_workers(player, n, workers, snapshot, snapshot_interval):
+    """
+    Train `player` like `train` with `workers` processes, each playing its
+    share of the `n` games and updating the Q-values in a shared memory
+    block as it goes, Hogwild style, while this process takes snapshots.
+    """
+    initial = player.states.initial
+    memory = shared_memory.SharedMemory(create=True, size=player.q.nbytes)
+    try:
+        q = np.ndarray(player.q.shape, dtype=player.q.dtype, buffer=memory.buf)
+        q[:] = player.q
+        played = multiprocessing.Array("q", workers, lock=False)
+        processes = [
+            multiprocessing.Process(target=train_worker, args=(
+                memory.name, n // workers + (k < n % workers), initial,
+                player.alpha, player.epsilon, played, k
+            ))
+            for k in range(workers)
+        ]
+
+        start = time.perf_counter()
+        for process in processes:
+            process.start()
+        running = processes
+        next_snapshot = snapshot_interval
+        while running:
+            timeout = None
+            if snapshot is not None:
+                timeout = max(0, start + next_snapshot - time.perf_counter())
+            multiprocessing.connection.wait([process.sentinel for process in running], timeout)
+            running = [process for process in running if process.is_alive()]
+
+            elapsed = time.perf_counter() - start
+            if snapshot is not None and elapsed >= next_snapshot:
+                copied = player.copy(q)
+                copied.games += sum(played)
+                snapshot(elapsed, sum(played), copied)
+                next_snapshot += snapshot_interval
+
+        for process in processes:
+            process.join()
+        player.q = q.copy()
+        player.games += n
+        del q
+    finally:
+        memory.close()
+        memory.unlink()
+
+    print("Done training")
+    return player
+
+
+def train_worker(name, games, initial, alpha, epsilon, played, worker):
+    """
+    Play `games` training games in a worker process, updating the Q-values
+    in the shared memory block `name` and counting the games played in
+    `played[worker]`.
+    """
+    random.seed()
+    memory = shared_memory.SharedMemory(name=name)
+    try:
+        player = NimAI(alpha, epsilon, initial)
+        player.q = np.ndarray(player.q.shape, dtype=player.q.dtype, buffer=memory.buf)
+        for _ in range(games):
+            train_game(player, initial)
+            played[worker] += 1
+        del player.q
+    finally:
+        memory.close()
+
+
 def play(ai, human_player=None):
     """
     Play human game against the AI.
@@ -241,7 +444,7 @@ def play(ai, human_player=None):
         human_player = random.randint(0, 1)
 
     # Create new game
-    game = Nim()
+    game = Nim(ai.states.initial)
 
     # Game loop
     while True:
@@ -1,4 +1,18 @@
-from nim import train, play
+import os
+import sys
 
-ai = train(10000)
+from nim import NimAI, train, play
+
+MODEL = "nim.qtable"
+
+if len(sys.argv) > 2:
+    sys.exit("Usage: python play.py [model]")
+model = sys.argv[1] if len(sys.argv) == 2 else MODEL
+
+# Load a saved AI, or train one and save it for next time
+if os.path.exists(model):
+    ai = NimAI.load(model)
+else:
+    ai = train(10000)
+    ai.save(model)
 play(ai)
@@ -0,0 +1,76 @@
+import numpy as np
+
+
+class PileStates():
+
+    def __init__(self, initial, offsets=None, moves=None):
+        """
+        Number every pile configuration reachable from the piles in
+        `initial`, and every action, so that they can index arrays.
+
+        A configuration is numbered as a mixed-radix integer whose i-th
+        digit is the size of pile i, and has radix `initial[i] + 1`, so
+        configuration 0 has every pile empty. Actions `(i, j)` are
+        numbered pile by pile, then by `j`, and taking action `a` from
+        configuration `s` leads to configuration `s - deltas[a]`.
+
+        The legal actions of configuration `s` are listed, in order, in
+        `moves[offsets[s]:offsets[s + 1]]`, so an array indexed like
+        `moves` has an entry for every legal action in every configuration.
+        Since action `(i, j)` is legal when pile i has at least j objects,
+        it is entry `offsets[s] + sum(piles[:i]) + j - 1`. If `offsets`
+        and `moves` are given, such as memory maps of a saved table, they
+        are used instead of being computed again.
+        """
+        self.initial = list(initial)
+        self.radices = np.array(self.initial, dtype=np.int64) + 1
+        self.places = np.cumprod(np.concatenate([[1], self.radices[:-1]]))
+        self.place_list = self.places.tolist()
+        self.count = int(np.prod(self.radices))
+        self.actions = [
+            (i, j) for i, pile in enumerate(self.initial) for j in range(1, pile + 1)
+        ]
+        self.action_index = {action: k for k, action in enumerate(self.actions)}
+        self.action_piles = np.array([i for i, _ in self.actions], dtype=np.int64)
+        self.action_counts = np.array([j for _, j in self.actions], dtype=np.int64)
+        self.deltas = self.action_counts * self.places[self.action_piles]
+
+        if offsets is None or moves is None:
+            numbers = np.arange(self.count, dtype=np.int64)
+            sizes = (numbers[:, np.newaxis] // self.places % self.radices).sum(axis=1)
+            offsets = np.concatenate([[0], np.cumsum(sizes)])
+            moves = np.nonzero(self.legal(numbers))[1].astype(np.int32)
+        self.offsets = offsets
+        self.moves = moves
+        self.start = self.encode(self.initial)
+
+    def __len__(self):
+        return self.count
+
+    def encode(self, piles):
+        """
+        Return the number of the configuration `piles`.
+        """
+        return sum(pile * place for pile, place in zip(piles, self.place_list))
+
+    def decode(self, state):
+        """
+        Return the piles of configuration number `state` as a list.
+        """
+        return (state // self.places % self.radices).tolist()
+
+    def legal(self, states):
+        """
+        Return an array of whether each action can be taken in each of the
+        configurations numbered `states`.
+        """
+        piles = np.asarray(states)[:, np.newaxis] // self.places % self.radices
+        return piles[:, self.action_piles] >= self.action_counts
+
+    def move(self, piles, action):
+        """
+        Return the index in `moves` of the legal action `(i, j)` in the
+        configuration `piles`.
+        """
+        i, j = action
+        return int(self.offsets[self.encode(piles)]) + sum(piles[:i]) + j - 1
@@ -0,0 +1,117 @@
+import time
+
+import numpy as np
+
+from nim import NimAI
+from states import PileStates
+
+GAMES = 1000
+REPORT = 10000
+
+
+def train_vectorized(n, initial=[1, 3, 5, 7], games=GAMES, alpha=0.5,
+                     epsilon=0.1, seed=None, report=REPORT):
+    """
+    Train an AI by playing `n` games against itself, like `train`, but
+    with up to `games` games played in lockstep with NumPy.
+
+    Pile configurations and actions are numbered by `PileStates`, and
+    Q-values are kept in an array indexed by configuration and action,
+    which is -inf for illegal actions so that they are never the best,
+    and copied into the AI's table of legal actions at the end.
+    At every step, each game in progress chooses its action by epsilon
+    greedy selection, and the Q-values are updated like `train` does.
+    A finished game is replaced by a new one until `n` games have been
+    started. Progress is printed every `report` games.
+    """
+    rng = np.random.default_rng(seed)
+    states = PileStates(initial)
+    sizes = np.diff(states.offsets)
+    rows = np.repeat(np.arange(len(states)), sizes)
+    q = np.full((len(states), len(states.actions)), -np.inf)
+    q[rows, states.moves] = 0
+    games = max(1, min(games, n))
+    actions = len(states.actions)
+
+    state = np.full(games, states.start)
+    player = np.zeros(games, dtype=np.int64)
+    last = np.full((2, games), -1)
+    index = np.arange(games)
+    started = games
+    finished = 0
+    start = time.perf_counter()
+
+    while len(index):
+        old = state[index]
+        mover = player[index]
+
+        # Exploring games choose uniformly among their legal actions
+        action = q[old].argmax(axis=1)
+        explore = np.flatnonzero(rng.random(len(index)) < epsilon)
+        choice = (rng.random(len(explore)) * sizes[old[explore]]).astype(np.int64)
+        action[explore] = states.moves[states.offsets[old[explore]] + choice]
+        new = old - states.deltas[action]
+        done = new == 0
+
+        # Moves are numbered by configuration and action. The mover loses
+        # if they took the last object, and the other player's last move
+        # is rewarded by the outcome or the best Q-value of the new
+        # configuration
+        move = old * actions + action
+        previous = last[1 - mover, index]
+        last[mover, index] = move
+        follows = previous >= 0
+        future = np.where(done, 1, q[new].max(axis=1))
+        update_moves(
+            q,
+            np.concatenate([move[done], previous[follows]]),
+            np.concatenate([np.full(done.sum(), -1.0), future[follows]]),
+            alpha
+        )
+        state[index] = new
+        player[index] = 1 - mover
+
+        # Replace finished games with new ones
+        ended = index[done]
+        if len(ended):
+            finished += len(ended)
+            restart = ended[:max(0, n - started)]
+            started += len(restart)
+            state[restart] = states.start
+            player[restart] = 0
+            last[:, restart] = -1
+            if len(restart) < len(ended):
+                index = np.setdiff1d(index, ended[len(restart):])
+
+            if report and finished // report > (finished - len(ended)) // report:
+                elapsed = time.perf_counter() - start
+                print(f"Played {finished} training games ({finished / elapsed:.0f} games per second)")
+
+    print("Done training")
+    return q_player(states, q, alpha, epsilon)
+
+
+def update_moves(q, moves, targets, alpha):
+    """
+    Move the Q-values of `moves`, numbered by configuration and action,
+    towards `targets` at the learning rate `alpha`.
+
+    A move updated k times at once moves towards the average of its
+    targets by 1 - (1 - alpha) ** k, as far as k updates in a row would.
+    """
+    moves, pairs = np.unique(moves, return_inverse=True)
+    counts = np.bincount(pairs)
+    average = np.bincount(pairs, targets) / counts
+    states, actions = np.divmod(moves, q.shape[1])
+    q[states, actions] += (1 - (1 - alpha) ** counts) * (average - q[states, actions])
+
+
+def q_player(states, q, alpha, epsilon):
+    """
+    Return a NimAI with the Q-values `q` of every legal action in every
+    configuration of `states`.
+    """
+    player = NimAI(alpha, epsilon, states.initial)
+    rows = np.repeat(np.arange(len(states)), np.diff(states.offsets))
+    player.q = q[rows, states.moves]
+    return player
@@ -0,0 +1,78 @@
+import argparse
+import os
+import time
+
+from crossword import *
+from generate import CrosswordCreator
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate many crosswords from one vocabulary."
+    )
+    parser.add_argument("words")
+    parser.add_argument("output", help="directory to write crosswords to")
+    parser.add_argument("structures", nargs="+")
+    parser.add_argument(
+        "--index",
+        help="word index file, built from words if missing or out of date "
+             "(default: words file with an .index suffix)"
+    )
+    parser.add_argument(
+        "--images", action="store_true",
+        help="also save an image of each crossword"
+    )
+    parser.add_argument(
+        "--timeout", type=float,
+        help="wall-clock budget for solving each crossword, in seconds"
+    )
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = WordIndex.cached(args.words, args.index)
+    print(f"Loaded word index in {time.perf_counter() - start:.3f}s")
+
+    os.makedirs(args.output, exist_ok=True)
+    start = time.perf_counter()
+    solved = generate_all(
+        args.structures, args.words, index, args.output,
+        images=args.images, timeout=args.timeout
+    )
+    elapsed = time.perf_counter() - start
+    print(
+        f"Solved {solved} of {len(args.structures)} crosswords in "
+        f"{elapsed:.3f}s ({len(args.structures) / elapsed:.1f} puzzles per second)"
+    )
+
+
+def generate_all(structures, words, index, output, images=False, timeout=None):
+    """
+    Fill every structure file in `structures` using the shared word
+    `index`, writing each result to a text file in the `output` directory,
+    and an image alongside it if `images` is True.
+    Return the number of crosswords solved.
+    """
+    solved = 0
+    for structure in structures:
+        name = os.path.splitext(os.path.basename(structure))[0]
+        crossword = Crossword(structure, words, index=index)
+        creator = CrosswordCreator(crossword)
+        assignment = creator.solve(timeout=timeout)
+
+        with open(os.path.join(output, f"{name}.txt"), "w") as f:
+            if creator.timed_out:
+                f.write("No solution found in time.\n")
+            elif assignment is None:
+                f.write("No solution.\n")
+            else:
+                f.write(creator.text(assignment))
+        if assignment is not None:
+            solved += 1
+            if images:
+                creator.save(assignment, os.path.join(output, f"{name}.png"))
+
+    return solved
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from crossword import *
+from batch import generate_all
+from generate import CrosswordCreator
+
+STRUCTURES = [f"data/structure{i}.txt" for i in range(3)]
+WORDS = "data/words2.txt"
+SYNTHETIC_WORDS = 100000
+DENSE_SIZES = [5, 7]
+LARGE_SIZE = 100
+BATCH_PUZZLES = 30
+HARD_SIZE = 13
+HARD_STRUCTURES = 6
+TIMEOUT = 10
+SOLVERS = [
+    ("backtracking", dict()),
+    ("backjumping", dict(backjumping=True)),
+    ("backjumping with restarts", dict(backjumping=True, restarts=True))
+]
+INFERENCES = [None, "forward", "mac"]
+
+
+def main():
+    if len(sys.argv) not in [1, 2]:
+        sys.exit("Usage: python benchmark.py [synthetic_words]")
+    synthetic_words = int(sys.argv[1]) if len(sys.argv) == 2 else SYNTHETIC_WORDS
+
+    with tempfile.TemporaryDirectory() as directory:
+        synthetic = os.path.join(directory, "synthetic.txt")
+        write_synthetic_words(synthetic, synthetic_words)
+
+        for words, name in [(WORDS, WORDS), (synthetic, f"{synthetic_words} synthetic words")]:
+            print(f"Words: {name}")
+            for structure in STRUCTURES:
+                benchmark_ac3(structure, words)
+
+        structures = STRUCTURES.copy()
+        for size in DENSE_SIZES:
+            dense = os.path.join(directory, f"dense{size}.txt")
+            write_dense_structure(dense, size)
+            structures.append(dense)
+
+        print(f"Generating {BATCH_PUZZLES} crosswords with {synthetic_words} synthetic words")
+        benchmark_batch(synthetic, directory)
+
+        large = os.path.join(directory, f"large{LARGE_SIZE}.txt")
+        write_random_structure(large, LARGE_SIZE)
+        print(f"Constructing {LARGE_SIZE}x{LARGE_SIZE} structure")
+        benchmark_construction(large, WORDS)
+
+        print(f"Solving with {WORDS}")
+        for structure in structures:
+            for inference in INFERENCES:
+                benchmark_solve(structure, WORDS, inference)
+
+        hard = []
+        for seed in range(HARD_STRUCTURES):
+            structure = os.path.join(directory, f"hard{seed}.txt")
+            write_random_structure(structure, HARD_SIZE, density=0.3, seed=seed)
+            hard.append(structure)
+
+        print(
+            f"Solving {HARD_STRUCTURES} random {HARD_SIZE}x{HARD_SIZE} "
+            f"structures with {WORDS}, {TIMEOUT}s timeout"
+        )
+        for name, options in SOLVERS:
+            benchmark_solvers(name, options, hard, WORDS)
+
+
+def write_synthetic_words(filename, n, seed=0):
+    """
+    Write `n` distinct random words of length 3 to 12 to `filename`.
+    """
+    rng = random.Random(seed)
+    words = set()
+    while len(words) < n:
+        length = rng.randint(3, 12)
+        words.add("".join(rng.choices(string.ascii_uppercase, k=length)))
+    with open(filename, "w") as f:
+        f.write("\n".join(sorted(words)))
+
+
+def write_dense_structure(filename, size):
+    """
+    Write a `size` x `size` lattice structure to `filename`, where every
+    other row and column is a word, crossing at every other letter.
+    """
+    with open(filename, "w") as f:
+        for i in range(size):
+            f.write("".join(
+                "#" if i % 2 == 1 and j % 2 == 1 else "_"
+                for j in range(size)
+            ) + "\n")
+
+
+def write_random_structure(filename, size, density=0.25, seed=0):
+    """
+    Write a `size` x `size` structure to `filename` with a random
+    `density` of blocked cells.
+    """
+    rng = random.Random(seed)
+    with open(filename, "w") as f:
+        for _ in range(size):
+            f.write("".join(
+                "#" if rng.random() < density else "_"
+                for _ in range(size)
+            ) + "\n")
+
+
+def benchmark_construction(structure, words):
+    """
+    Print time taken and peak memory used to construct the crossword.
+    """
+    start = time.perf_counter()
+    crossword = Crossword(structure, words)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    Crossword(structure, words)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"  {len(crossword.variables)} variables, "
+        f"{len(crossword.overlaps)} overlaps: "
+        f"{elapsed:.3f}s, peak memory {peak / 2 ** 20:.1f}MiB"
+    )
+
+
+def benchmark_ac3(structure, words):
+    """
+    Print time taken to build the crossword and to enforce arc consistency.
+    """
+    start = time.perf_counter()
+    crossword = Crossword(structure, words)
+    creator = CrosswordCreator(crossword)
+    built = time.perf_counter()
+    creator.enforce_node_consistency()
+    creator.ac3()
+    solved = time.perf_counter()
+    print(
+        f"  {structure}: setup {built - start:.3f}s, "
+        f"ac3 {(solved - built) * 1000:.2f}ms"
+    )
+
+
+def benchmark_batch(words, directory):
+    """
+    Print throughput of filling crosswords when each one re-reads the
+    vocabulary, and when they share a word index cached on disk.
+    """
+    structures = [STRUCTURES[k % len(STRUCTURES)] for k in range(BATCH_PUZZLES)]
+    output = os.path.join(directory, "batch")
+    os.makedirs(output, exist_ok=True)
+
+    start = time.perf_counter()
+    for structure in structures:
+        CrosswordCreator(Crossword(structure, words)).solve()
+    elapsed = time.perf_counter() - start
+    print(f"  re-reading vocabulary: {BATCH_PUZZLES / elapsed:.1f} puzzles per second")
+
+    index_file = os.path.join(directory, "words.index")
+    WordIndex.cached(words, index_file)
+    start = time.perf_counter()
+    index = WordIndex.cached(words, index_file)
+    generate_all(structures, words, index, output)
+    elapsed = time.perf_counter() - start
+    print(f"  cached word index: {BATCH_PUZZLES / elapsed:.1f} puzzles per second")
+
+
+def benchmark_solve(structure, words, inference):
+    """
+    Print nodes visited and time taken to solve the crossword.
+    """
+    crossword = Crossword(structure, words)
+    creator = CrosswordCreator(crossword, inference=inference)
+    start = time.perf_counter()
+    assignment = creator.solve()
+    elapsed = time.perf_counter() - start
+    result = "solved" if assignment is not None else "no solution"
+    print(
+        f"  {os.path.basename(structure)} ({inference}): {result}, "
+        f"{creator.nodes} nodes, {elapsed:.3f}s"
+    )
+
+
+def benchmark_solvers(name, options, structures, words):
+    """
+    Print how many of `structures` a solver configured with `options`
+    finishes before timing out, and the total time taken.
+    """
+    finished = 0
+    solved = 0
+    start = time.perf_counter()
+    for structure in structures:
+        creator = CrosswordCreator(Crossword(structure, words), seed=0, **options)
+        assignment = creator.solve(timeout=TIMEOUT)
+        if not creator.timed_out:
+            finished += 1
+        if assignment is not None:
+            solved += 1
+    elapsed = time.perf_counter() - start
+    print(
+        f"  {name}: {finished} finished ({solved} solved, "
+        f"{finished - solved} proven impossible), {elapsed:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,9 @@
+import bisect
+import json
+import mmap
+import os
+
+
 class Variable():
     ACROSS = "across"
     DOWN = "down"
@@ -34,9 +40,184 @@ class Variable():
         return f"Variable({self.i}, {self.j}, {direction}, {self.length})"
 
 
+def bitset(indices, size):
+    """
+    Return integer bitset of `size` bits with the bits in `indices` set.
+    Built from a string of binary digits, which is linear in `size`
+    rather than quadratic like OR-ing the bits in one at a time.
+    """
+    digits = bytearray(b"0" * size)
+    for k in indices:
+        digits[size - 1 - k] = ord("1")
+    return int(digits.decode() or "0", 2)
+
+
+class WordIndex():
+
+    # Identifies files written by WordIndex.save
+    MAGIC = b"CROSSWORD-INDEX-1\n"
+
+    def __init__(self, words):
+        """
+        Index a vocabulary by word length.
+
+        Words of each length are sorted and numbered, so that a set of words
+        of one length can be stored as an integer bitset, where bit k is set
+        if the kth word of that length is in the set. For every length,
+        position and letter, `self.letters` holds the bitset of words with
+        that letter at that position.
+        """
+        self.words = dict()
+        for word in sorted(set(words)):
+            self.words.setdefault(len(word), []).append(word)
+
+        self.letters = dict()
+        for length, words in self.words.items():
+            positions = dict()
+            for k, word in enumerate(words):
+                for position, letter in enumerate(word):
+                    positions.setdefault((position, letter), []).append(k)
+            for (position, letter), ks in positions.items():
+                self.letters[length, position, letter] = bitset(ks, len(words))
+
+        self.build_lookups()
+
+    def build_lookups(self):
+        """
+        Compute the lookups derived from `self.words` and `self.letters`.
+        """
+        self.vocabulary = set()
+        for words in self.words.values():
+            self.vocabulary.update(words)
+
+        # Letters seen at each (length, position), to iterate over in revise
+        self.alphabet = dict()
+        for length, position, letter in self.letters:
+            self.alphabet.setdefault((length, position), []).append(letter)
+
+    @classmethod
+    def from_file(cls, words_file):
+        """Read a vocabulary file, one word per line, and index it."""
+        with open(words_file) as f:
+            return cls(f.read().upper().splitlines())
+
+    def save(self, filename):
+        """
+        Write the index to `filename`, so that it can be loaded again with
+        `WordIndex.load` without re-reading and re-indexing the vocabulary.
+
+        The file holds `WordIndex.MAGIC`, the length of a JSON header as an
+        8-byte little-endian integer, the header, and then the words of each
+        length and the letter bitsets as little-endian integers. The header
+        holds the offset and size within the body of each of those.
+        """
+        body = bytearray()
+
+        def append(data):
+            body.extend(data)
+            return [len(body) - len(data), len(data)]
+
+        header = {"words": [], "letters": []}
+        for length, words in self.words.items():
+            header["words"].append([length] + append("\n".join(words).encode()))
+        for (length, position, letter), letters in self.letters.items():
+            data = letters.to_bytes((letters.bit_length() + 7) // 8, "little")
+            header["letters"].append([length, position, letter] + append(data))
+
+        header = json.dumps(header).encode()
+        with open(filename, "wb") as f:
+            f.write(WordIndex.MAGIC)
+            f.write(len(header).to_bytes(8, "little"))
+            f.write(header)
+            f.write(body)
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Load an index written by `WordIndex.save`, reading the words and
+        bitsets straight out of a memory map of the file.
+        """
+        with open(filename, "rb") as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if data[:len(cls.MAGIC)] != cls.MAGIC:
+                raise ValueError(f"{filename} is not a word index")
+            start = len(cls.MAGIC) + 8
+            size = int.from_bytes(data[len(cls.MAGIC):start], "little")
+            header = json.loads(data[start:start + size])
+            start += size
+
+            index = cls.__new__(cls)
+            index.words = dict()
+            for length, offset, size in header["words"]:
+                words = data[start + offset:start + offset + size].decode()
+                index.words[length] = words.split("\n") if words else [""]
+            index.letters = dict()
+            for length, position, letter, offset, size in header["letters"]:
+                index.letters[length, position, letter] = int.from_bytes(
+                    data[start + offset:start + offset + size], "little"
+                )
+
+        index.build_lookups()
+        return index
+
+    @classmethod
+    def cached(cls, words_file, index_file=None):
+        """
+        Return the index of `words_file`, loaded from `index_file` if it is
+        at least as new as `words_file`, and otherwise built and saved there.
+        `index_file` defaults to `words_file` with an ".index" suffix.
+        """
+        if index_file is None:
+            index_file = words_file + ".index"
+        if (
+                os.path.exists(index_file) and
+                os.path.getmtime(index_file) >= os.path.getmtime(words_file)
+        ):
+            return cls.load(index_file)
+
+        index = cls.from_file(words_file)
+        index.save(index_file)
+        return index
+
+    def domain(self, length):
+        """Return bitset of every word with the given length."""
+        return (1 << len(self.words.get(length, []))) - 1
+
+    def bit(self, word):
+        """Return bitset containing only `word`."""
+        return 1 << bisect.bisect_left(self.words[len(word)], word)
+
+    def with_letter(self, length, position, letter):
+        """Return bitset of words of the given length with `letter` at `position`."""
+        return self.letters.get((length, position, letter), 0)
+
+    def decode(self, length, bitset):
+        """Return list of words of the given length in `bitset`."""
+        words = self.words.get(length, [])
+        bits = bin(bitset)[:1:-1]
+        return [words[k] for k, bit in enumerate(bits) if bit == "1"]
+
+    def compatible(self, length, position, bitset, other_length, other_position):
+        """
+        Return bitset of words of length `length` whose letter at
+        `position` matches the letter at `other_position` of at least one
+        word of length `other_length` in `bitset`.
+        """
+        compatible = 0
+        for letter in self.alphabet.get((other_length, other_position), []):
+            if bitset & self.letters[other_length, other_position, letter]:
+                compatible |= self.letters.get((length, position, letter), 0)
+        return compatible
+
+
 class Crossword():
 
-    def __init__(self, structure_file, words_file):
+    def __init__(self, structure_file, words_file, index=None):
+        """
+        Create a crossword from a structure file and a vocabulary file.
+        If `index` is given, it is used as the already built `WordIndex`
+        of the vocabulary, and `words_file` is not read.
+        """
 
         # Determine structure of crossword
         with open(structure_file) as f:
@@ -57,8 +238,10 @@ class Crossword():
                 self.structure.append(row)
 
         # Save vocabulary list
-        with open(words_file) as f:
-            self.words = set(f.read().upper().splitlines())
+        if index is None:
+            index = WordIndex.from_file(words_file)
+        self.index = index
+        self.words = index.vocabulary
 
         # Determine variable set
         self.variables = set()
@@ -104,29 +287,33 @@ class Crossword():
                         ))
 
         # Compute overlaps for each word
-        # For any pair of variables v1, v2, their overlap is either:
-        #    None, if the two variables do not overlap; or
+        # For any pair of overlapping variables v1, v2, their overlap is
         #    (i, j), where v1's ith character overlaps v2's jth character
+        # Pairs of variables that do not overlap are left out, so use
+        # `self.overlaps.get((v1, v2))` to get None for those.
+        # Overlaps are found in one pass over the cells of every variable,
+        # since each cell belongs to at most one across and one down word.
+        cells = dict()
+        for var in self.variables:
+            for k, cell in enumerate(var.cells):
+                cells.setdefault(cell, []).append((var, k))
+
         self.overlaps = dict()
-        for v1 in self.variables:
-            for v2 in self.variables:
-                if v1 == v2:
-                    continue
-                cells1 = v1.cells
-                cells2 = v2.cells
-                intersection = set(cells1).intersection(cells2)
-                if not intersection:
-                    self.overlaps[v1, v2] = None
-                else:
-                    intersection = intersection.pop()
-                    self.overlaps[v1, v2] = (
-                        cells1.index(intersection),
-                        cells2.index(intersection)
-                    )
+        self.adjacency = {var: set() for var in self.variables}
+        for words in cells.values():
+            if len(words) == 2:
+                (v1, k1), (v2, k2) = words
+                self.overlaps[v1, v2] = (k1, k2)
+                self.overlaps[v2, v1] = (k2, k1)
+                self.adjacency[v1].add(v2)
+                self.adjacency[v2].add(v1)
+
+        # Pair each neighbor with its overlap, for incremental consistency checks
+        self.neighbor_overlaps = {
+            var: [(v, self.overlaps[var, v]) for v in self.adjacency[var]]
+            for var in self.variables
+        }
 
     def neighbors(self, var):
         """Given a variable, return set of overlapping variables."""
-        return set(
-            v for v in self.variables
-            if v != var and self.overlaps[v, var]
-        )
+        return self.adjacency[var]
@@ -1,22 +1,81 @@
+import argparse
 import itertools
-import sys
-from queue import Queue
+import random
+import time
+from queue import Empty, Queue
 
 from crossword import *
 
 
+class Restart(Exception):
+    """Raised to abandon the current search and restart from the root."""
+
+
 class CrosswordCreator():
 
-    def __init__(self, crossword):
+    def __init__(self, crossword, inference="mac", backjumping=False,
+                 restarts=False, seed=None, variable_ordering="mrv",
+                 value_ordering="lcv"):
         """
         Create new CSP crossword generate.
+
+        `inference` is the inference run after each assignment during
+        backtracking: "mac" to maintain arc consistency, "forward" for
+        forward checking of neighbors only, or None for no inference.
+
+        `variable_ordering` is "mrv" to choose the variable with fewest
+        remaining values first, or "domdeg" to choose the one with the
+        lowest ratio of remaining values to degree. `value_ordering` is
+        "lcv" to try least-constraining values first, or "random".
+
+        If `backjumping` is True, search with conflict-directed backjumping
+        and learn nogoods from failures. If `restarts` is also True, restart
+        the search with a growing node budget, keeping learned nogoods.
+        Ties in variable selection are broken randomly, from `seed`.
         """
         self.crossword = crossword
+        self.inference = inference
+        self.backjumping = backjumping
+        self.restarts = restarts
+        self.random = random.Random(seed)
+        self.variable_ordering = variable_ordering
+        self.value_ordering = value_ordering
+        self.index = crossword.index
+
+        # Each domain is a bitset over the words of the variable's length
         self.domains = {
-            var: self.crossword.words.copy()
+            var: self.index.domain(var.length)
             for var in self.crossword.variables
         }
 
+        # Assigned variables responsible for values pruned from each domain
+        self.reasons = {
+            var: frozenset()
+            for var in self.crossword.variables
+        }
+
+        # Previous domains, restored when backtracking past an assignment
+        self.trail = []
+
+        # Variable whose domain was last emptied by inference
+        self.wiped_out = None
+
+        # Words used by the assignment being built, mapped to their variable
+        self.used_words = dict()
+
+        # Learned nogoods, i.e. combinations of (variable, word) pairs that
+        # can't be extended to a solution, indexed by each of their pairs
+        self.nogoods = dict()
+
+        # Number of nodes of the search tree visited, and the number at
+        # which to restart the search
+        self.nodes = 0
+        self.node_limit = None
+
+        # Deadline for the search, and whether it was reached
+        self.deadline = None
+        self.timed_out = False
+
     def letter_grid(self, assignment):
         """
         Return 2D array representing a given assignment.
@@ -37,14 +96,23 @@ class CrosswordCreator():
         """
         Print crossword assignment to the terminal.
         """
+        print(self.text(assignment), end="")
+
+    def text(self, assignment):
+        """
+        Return crossword assignment as a string, one line per row.
+        """
         letters = self.letter_grid(assignment)
+        lines = []
         for i in range(self.crossword.height):
+            line = ""
             for j in range(self.crossword.width):
                 if self.crossword.structure[i][j]:
-                    print(letters[i][j] or " ", end="")
+                    line += letters[i][j] or " "
                 else:
-                    print("█", end="")
-            print()
+                    line += "█"
+            lines.append(line + "\n")
+        return "".join(lines)
 
     def save(self, assignment, filename):
         """
@@ -87,24 +155,57 @@ class CrosswordCreator():
 
         img.save(filename)
 
-    def solve(self):
+    def solve(self, timeout=None):
         """
         Enforce node and arc consistency, and then solve the CSP.
+
+        If `timeout` seconds pass before the search finishes, set
+        `self.timed_out` and return None.
         """
+        if timeout is not None:
+            self.deadline = time.monotonic() + timeout
+
         self.enforce_node_consistency()
-        self.ac3()
-        return self.backtrack(dict())
+        if not self.ac3():
+            return None
+
+        try:
+            if not self.backjumping:
+                return self.backtrack(dict())
+            elif not self.restarts:
+                return self.backjump(dict())[0]
+            else:
+                return self.restart_search()
+        except TimeoutError:
+            self.timed_out = True
+            return None
+
+    def restart_search(self, budget=100, growth=1.5):
+        """
+        Search with backjumping, restarting from an empty assignment every
+        time the search visits `budget` more nodes, growing the budget by
+        `growth` after each restart. Learned nogoods are kept across restarts.
+        """
+        mark = len(self.trail)
+        while True:
+            self.node_limit = self.nodes + int(budget)
+            try:
+                return self.backjump(dict())[0]
+            except Restart:
+                self.undo(mark)
+                self.used_words = dict()
+                budget *= growth
 
     def enforce_node_consistency(self):
         """
         Update `self.domains` such that each variable is node-consistent.
         (Remove any values that are inconsistent with a variable's unary
          constraints; in this case, the length of the word.)
+        Domains are indexed by word length, so this only masks each domain
+        to the words of its variable's length.
         """
         for var in self.domains:
-            for val in list(self.domains[var]):
-                if var.length != len(val):
-                    self.domains[var].remove(val)
+            self.domains[var] &= self.index.domain(var.length)
 
     def revise(self, x, y):
         """
@@ -115,14 +216,53 @@ class CrosswordCreator():
         Return True if a revision was made to the domain of `x`; return
         False if no revision was made.
         """
-        revised = False
         i, j = self.crossword.overlaps[x, y]
-        for val_x in self.domains[x].copy():
-            if all(val_x[i] != val_y[j] for val_y in self.domains[y]):
-                self.domains[x].remove(val_x)
-                revised = True
+        compatible = self.index.compatible(x.length, i, self.domains[y], y.length, j)
+        revised = self.domains[x] & compatible
+        if revised == self.domains[x]:
+            return False
 
-        return revised
+        self.set_domain(x, revised, self.reasons[y])
+        return True
+
+    def set_domain(self, var, domain, reason=frozenset()):
+        """
+        Replace the domain of `var`, recording its previous domain on the trail.
+        `reason` is the set of assigned variables responsible for the change.
+        """
+        self.trail.append((var, self.domains[var], self.reasons[var]))
+        self.domains[var] = domain
+        if reason:
+            self.reasons[var] = self.reasons[var] | reason
+
+    def undo(self, mark):
+        """
+        Restore every domain changed since the trail had length `mark`.
+        """
+        while len(self.trail) > mark:
+            var, domain, reason = self.trail.pop()
+            self.domains[var] = domain
+            self.reasons[var] = reason
+
+    def infer(self, var, assignment):
+        """
+        Reduce the domains of the neighbors of `var` after it has been
+        assigned `assignment[var]`, according to `self.inference`.
+
+        Return False if some domain ends up empty; return True otherwise.
+        """
+        self.set_domain(var, self.index.bit(assignment[var]), frozenset([var]))
+        if self.inference == "mac":
+            return self.ac3([
+                (neighbor, var) for neighbor in self.crossword.neighbors(var)
+            ])
+        elif self.inference == "forward":
+            for neighbor in self.crossword.neighbors(var):
+                if neighbor not in assignment and self.revise(neighbor, var):
+                    if self.domains[neighbor] == 0:
+                        self.wiped_out = neighbor
+                        return False
+        return True
 
     def ac3(self, arcs=None):
         """
@@ -139,10 +279,11 @@ class CrosswordCreator():
         while len(arcs) != 0:
             x, y = arcs.pop()
             if self.revise(x, y):
-                if len(self.domains[x]) == 0:
+                if self.domains[x] == 0:
+                    self.wiped_out = x
                     return False
-                for neighbor in self.crossword.neighbors(x) - self.domains[y]:
-                    arc = (x, neighbor)
+                for neighbor in self.crossword.neighbors(x) - {y}:
+                    arc = (neighbor, x)
                     arcs.append(arc)
 
         return True
@@ -151,10 +292,7 @@ class CrosswordCreator():
         arcs = []
         for var in self.domains:
             for neighbor in self.crossword.neighbors(var):
-                arc = var, neighbor
-                synonym_arc = neighbor, var
-                if arc not in arcs and synonym_arc not in arcs:
-                    arcs.append(arc)
+                arcs.append((var, neighbor))
 
         return arcs
 
@@ -163,11 +301,7 @@ class CrosswordCreator():
         Return True if `assignment` is complete (i.e., assigns a value to each
         crossword variable); return False otherwise.
         """
-        for var in self.crossword.variables:
-            if var not in assignment:
-                return False
-
-        return True
+        return len(assignment) == len(self.crossword.variables)
 
     def consistent(self, assignment):
         """
@@ -187,6 +321,51 @@ class CrosswordCreator():
 
         return True
 
+    def consistent_value(self, var, value, assignment):
+        """
+        Return True if assigning `value` to `var` keeps an already consistent
+        `assignment` consistent, checking only `var` against its neighbors
+        and the words in `self.used_words`; return False otherwise.
+        """
+        if value in self.used_words:
+            return False
+
+        for neighbor, (i, j) in self.crossword.neighbor_overlaps[var]:
+            if neighbor in assignment and value[i] != assignment[neighbor][j]:
+                return False
+
+        return True
+
+    def conflict_set(self, var, value, assignment):
+        """
+        Return the set of assigned variables that prevent assigning `value`
+        to `var`, because they use the same word, disagree with it on an
+        overlapping letter, or complete a learned nogood with it.
+        Return an empty set if `value` is consistent with `assignment`.
+        """
+        conflicts = set()
+        if value in self.used_words:
+            conflicts.add(self.used_words[value])
+
+        for neighbor, (i, j) in self.crossword.neighbor_overlaps[var]:
+            if neighbor in assignment and value[i] != assignment[neighbor][j]:
+                conflicts.add(neighbor)
+
+        for nogood in self.nogoods.get((var, value), []):
+            if all(assignment.get(v) == word for v, word in nogood if v != var):
+                conflicts.update(v for v, _ in nogood if v != var)
+
+        return conflicts
+
+    def learn_nogood(self, conflicts, assignment):
+        """
+        Record that the words assigned to the variables in `conflicts`
+        can't all be part of a solution.
+        """
+        nogood = frozenset((var, assignment[var]) for var in conflicts)
+        for pair in nogood:
+            self.nogoods.setdefault(pair, []).append(nogood)
+
     def order_domain_values(self, var, assignment):
         """
         Return a list of values in the domain of `var`, in order by
@@ -194,7 +373,26 @@ class CrosswordCreator():
         The first value in the list, for example, should be the one
         that rules out the fewest values among the neighbors of `var`.
         """
-        return self.domains[var]
+        values = self.index.decode(var.length, self.domains[var])
+        if self.value_ordering == "random":
+            self.random.shuffle(values)
+            return values
+
+        neighbors = [
+            (neighbor, self.crossword.overlaps[var, neighbor])
+            for neighbor in self.crossword.neighbors(var)
+            if neighbor not in assignment
+        ]
+
+        def ruled_out(value):
+            count = 0
+            for neighbor, (i, j) in neighbors:
+                domain = self.domains[neighbor]
+                remaining = domain & self.index.with_letter(neighbor.length, j, value[i])
+                count += domain.bit_count() - remaining.bit_count()
+            return count
+
+        return sorted(values, key=ruled_out)
 
     def select_unassigned_variable(self, assignment):
         """
@@ -204,17 +402,23 @@ class CrosswordCreator():
         degree. If there is a tie, any of the tied variables are acceptable
         return values.
         """
-        best_var = None
+        best_vars = []
+        best_key = None
         for var in self.crossword.variables:
             if var not in assignment:
-                if (
-                        best_var is None or
-                        len(self.domains[var]) < len(self.domains[best_var]) or
-                        len(self.crossword.neighbors(var)) > len(self.crossword.neighbors(best_var))
-                ):
-                    best_var = var
+                remaining = self.domains[var].bit_count()
+                degree = len(self.crossword.neighbors(var))
+                if self.variable_ordering == "domdeg":
+                    key = (remaining / max(degree, 1), -degree)
+                else:
+                    key = (remaining, -degree)
+                if best_key is None or key < best_key:
+                    best_vars = [var]
+                    best_key = key
+                elif key == best_key:
+                    best_vars.append(var)
 
-        return best_var
+        return self.random.choice(best_vars) if best_vars else None
 
     def backtrack(self, assignment):
         """
@@ -225,43 +429,209 @@ class CrosswordCreator():
 
         If no assignment is possible, return None.
         """
+        self.visit()
         if self.assignment_complete(assignment):
             return assignment
 
         var = self.select_unassigned_variable(assignment)
         for domain_value in self.order_domain_values(var, assignment):
+            if not self.consistent_value(var, domain_value, assignment):
+                continue
+
             assignment[var] = domain_value
-            if self.consistent(assignment):
+            self.used_words[domain_value] = var
+            mark = len(self.trail)
+            if self.infer(var, assignment):
                 result = self.backtrack(assignment)
                 if result is not None:
                     return result
+            self.undo(mark)
+            del self.used_words[domain_value]
             del assignment[var]
 
         return None
 
+    def backjump(self, assignment):
+        """
+        Using Conflict-Directed Backjumping, take as input a partial
+        assignment for the crossword and return a tuple `(result, conflicts)`.
 
-def main():
-    # Check usage
-    if len(sys.argv) not in [3, 4]:
-        sys.exit("Usage: python generate.py structure words [output]")
+        If a complete assignment is found, `result` is that assignment.
+        Otherwise `result` is None and `conflicts` is the set of assigned
+        variables responsible for the failure, so that the search can jump
+        straight back to the most recent of them.
+        """
+        self.visit()
+        if self.assignment_complete(assignment):
+            return assignment, None
+
+        var = self.select_unassigned_variable(assignment)
+
+        # Values already pruned from the domain of `var` were pruned because
+        # of these variables
+        conflicts = set(self.reasons[var])
+        for domain_value in self.order_domain_values(var, assignment):
+            value_conflicts = self.conflict_set(var, domain_value, assignment)
+            if value_conflicts:
+                conflicts.update(value_conflicts)
+                continue
+
+            assignment[var] = domain_value
+            self.used_words[domain_value] = var
+            mark = len(self.trail)
+            if self.infer(var, assignment):
+                result, child_conflicts = self.backjump(assignment)
+                if result is not None:
+                    return result, None
+            else:
+                child_conflicts = self.reasons[self.wiped_out]
+            self.undo(mark)
+            del self.used_words[domain_value]
+            del assignment[var]
 
-    # Parse command-line arguments
-    structure = sys.argv[1]
-    words = sys.argv[2]
-    output = sys.argv[3] if len(sys.argv) == 4 else None
+            # Jump over `var` if it played no part in the failure below it
+            if var not in child_conflicts:
+                return None, child_conflicts
+            conflicts.update(child_conflicts)
+
+        conflicts.discard(var)
+        if conflicts:
+            self.learn_nogood(conflicts, assignment)
+        return None, conflicts
+
+    def visit(self):
+        """
+        Count a node of the search tree, stopping the search if it has run
+        out of time or of nodes before a restart.
+        """
+        self.nodes += 1
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise TimeoutError
+        if self.node_limit is not None and self.nodes > self.node_limit:
+            raise Restart
+
+
+# Seconds between checks that portfolio workers are still running
+POLL_INTERVAL = 0.1
+
+# Solver configurations tried by the portfolio, assigned to workers in turn
+PORTFOLIO = [
+    dict(inference="mac"),
+    dict(inference="mac", backjumping=True, restarts=True),
+    dict(inference="mac", variable_ordering="domdeg", backjumping=True),
+    dict(inference="forward", backjumping=True, restarts=True),
+    dict(inference="mac", value_ordering="random", backjumping=True, restarts=True),
+    dict(inference="mac", variable_ordering="domdeg", value_ordering="random",
+         backjumping=True, restarts=True),
+]
+
+
+def portfolio_worker(worker, structure, words, options, timeout, results):
+    """
+    Solve the crossword with one solver configuration, and put a tuple
+    `(worker, finished, assignment)` on the `results` queue. A solver that
+    fails, for example by running out of stack, counts as not finished.
+    """
+    try:
+        creator = CrosswordCreator(Crossword(structure, words), **options)
+        assignment = creator.solve(timeout=timeout)
+        results.put((worker, not creator.timed_out, assignment))
+    except BaseException:
+        results.put((worker, False, None))
+
+
+def solve_portfolio(structure, words, workers, timeout=None):
+    """
+    Solve the crossword with `workers` differently configured and seeded
+    solvers in parallel processes, stopping the others as soon as one
+    finishes. Return a tuple `(assignment, options)` with the result and the
+    configuration of the winning solver; `options` is None if every solver
+    timed out or failed, or `timeout` seconds passed first. Workers that die
+    without putting a result count as failed.
+    """
+    import multiprocessing
+
+    results = multiprocessing.Queue()
+    configurations = [
+        dict(PORTFOLIO[worker % len(PORTFOLIO)], seed=worker)
+        for worker in range(workers)
+    ]
+    processes = [
+        multiprocessing.Process(
+            target=portfolio_worker,
+            args=(worker, structure, words, options, timeout, results),
+            daemon=True
+        )
+        for worker, options in enumerate(configurations)
+    ]
+    for process in processes:
+        process.start()
+
+    deadline = None if timeout is None else time.monotonic() + timeout
+    try:
+        remaining = len(processes)
+        while remaining:
+            wait = POLL_INTERVAL
+            if deadline is not None:
+                wait = min(wait, deadline - time.monotonic())
+                if wait <= 0:
+                    break
+            try:
+                worker, finished, assignment = results.get(timeout=wait)
+            except Empty:
+                # A worker's result is flushed to the queue before it exits
+                if not any(process.is_alive() for process in processes) and results.empty():
+                    break
+                continue
+            remaining -= 1
+            if finished:
+                return assignment, configurations[worker]
+        return None, None
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a crossword.")
+    parser.add_argument("structure")
+    parser.add_argument("words")
+    parser.add_argument("output", nargs="?")
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help="number of solver processes to run as a portfolio"
+    )
+    parser.add_argument(
+        "--timeout", type=float,
+        help="wall-clock budget for solving, in seconds"
+    )
+    args = parser.parse_args()
 
     # Generate crossword
-    crossword = Crossword(structure, words)
+    crossword = Crossword(args.structure, args.words)
     creator = CrosswordCreator(crossword)
-    assignment = creator.solve()
+    if args.workers > 1:
+        assignment, options = solve_portfolio(
+            args.structure, args.words, args.workers, args.timeout
+        )
+        if options is not None:
+            print(f"Winning configuration: {options}")
+        timed_out = options is None
+    else:
+        assignment = creator.solve(timeout=args.timeout)
+        timed_out = creator.timed_out
 
     # Print result
-    if assignment is None:
+    if timed_out:
+        print("No solution found in time.")
+    elif assignment is None:
         print("No solution.")
     else:
         creator.print(assignment)
-        if output:
-            creator.save(assignment, output)
+        if args.output:
+            creator.save(assignment, args.output)
 
 
 if __name__ == "__main__":
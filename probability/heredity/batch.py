@@ -0,0 +1,108 @@
+import csv
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+
+from elimination import eliminate
+from heredity import parse_person
+
+
+def main():
+    if len(sys.argv) < 3:
+        sys.exit("Usage: python batch.py output.npz data.csv [data.csv ...]")
+    families = dict()
+    for filename in sys.argv[2:]:
+        families.update(load_families(filename))
+
+    start = time.perf_counter()
+    timings = batch_probabilities(families, sys.argv[1])
+    elapsed = time.perf_counter() - start
+
+    for family in families:
+        print(f"  {family}: {len(families[family])} people, {timings[family] * 1000:.1f} ms")
+    print(f"Inferred {len(families)} families in {elapsed:.3f}s")
+
+
+def load_families(filename):
+    """
+    Load the families in a CSV file like `load_data` does, and return a
+    dictionary mapping each family id to its people.
+
+    If the file has a `family` column, every row belongs to the family
+    named in it, otherwise the whole file is one family, named after the
+    file without its extension.
+    """
+    families = dict()
+    default = os.path.splitext(os.path.basename(filename))[0]
+    with open(filename) as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            family = row.get("family", default)
+            families.setdefault(family, dict())[row["name"]] = parse_person(row)
+    return families
+
+
+def infer_family(item):
+    """
+    Compute the gene and trait distributions of everyone in a family,
+    given as a `(family, people)` pair.
+
+    Return a tuple `(family, names, genes, traits, seconds)`, where
+    `genes` has each person's probabilities of 2, 1 and 0 copies of the
+    gene, `traits` their probabilities of having the trait, and `seconds`
+    is how long the inference took.
+    """
+    family, people = item
+    start = time.perf_counter()
+    probabilities = eliminate(people)
+    seconds = time.perf_counter() - start
+    names = list(people)
+    genes = [
+        [probabilities[person]["gene"][count] for count in (2, 1, 0)]
+        for person in names
+    ]
+    traits = [probabilities[person]["trait"][True] for person in names]
+    return family, names, genes, traits, seconds
+
+
+def batch_probabilities(families, output, processes=None):
+    """
+    Compute the gene and trait distributions of everyone in every family
+    in `families`, a dictionary mapping family ids to their people, with
+    families inferred in parallel by `processes` worker processes (by
+    default, one per CPU).
+
+    The results are saved to `output` as a NumPy .npz file of columns,
+    with one row per person in `family`, `name`, `gene` (probabilities of
+    2, 1 and 0 copies) and `trait`, and one row per family in
+    `families` and `seconds`. Return a dictionary mapping each family id
+    to how long its inference took in seconds.
+    """
+    items = list(families.items())
+    processes = processes or os.cpu_count()
+    if processes == 1:
+        results = [infer_family(item) for item in items]
+    else:
+        chunksize = max(1, len(items) // (4 * processes))
+        with multiprocessing.Pool(processes) as pool:
+            results = pool.map(infer_family, items, chunksize)
+
+    people = sum(len(result[1]) for result in results)
+    columns = {
+        "family": np.repeat([result[0] for result in results],
+                            [len(result[1]) for result in results]),
+        "name": np.array([name for result in results for name in result[1]], dtype=str),
+        "gene": np.array([genes for result in results for genes in result[2]]).reshape(people, 3),
+        "trait": np.array([trait for result in results for trait in result[3]]),
+        "families": np.array([result[0] for result in results], dtype=str),
+        "seconds": np.array([result[4] for result in results]),
+    }
+    np.savez(output, **columns)
+    return {result[0]: result[4] for result in results}
+
+
+if __name__ == "__main__":
+    main()
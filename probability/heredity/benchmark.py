@@ -0,0 +1,220 @@
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+
+from batch import batch_probabilities, load_families
+from elimination import eliminate
+from heredity import gray_code_probabilities, load_data, powerset_probabilities
+from sampling import SAMPLES, gibbs_sampling, likelihood_weighting
+from vectorized import table_probabilities
+
+SIZES = [1000, 2000, 4000, 8000]
+ENUMERATION_SIZES = [8, 10, 12, 14]
+POWERSET_LIMIT = 8
+TABLE_SIZES = [8, 10, 12]
+SAMPLING_SIZE = 1000
+SAMPLING_SAMPLES = 10 ** 5
+TOLERANCE = 0.01
+BATCH_FAMILIES = 1000
+BATCH_SIZES = (3, 30)
+OBSERVED_TRAITS = 0.5
+MAX_CHILDREN = 4
+
+
+def main():
+    if len(sys.argv) > 2:
+        sys.exit("Usage: python benchmark.py [people]")
+    sizes = [int(sys.argv[1])] if len(sys.argv) == 2 else SIZES
+    benchmark_elimination(sizes)
+    benchmark_enumeration(ENUMERATION_SIZES)
+    benchmark_tables(TABLE_SIZES)
+    benchmark_sampling(SAMPLING_SIZE)
+    benchmark_batch(BATCH_FAMILIES)
+
+
+def family_tree(size, seed=0):
+    """
+    Return a randomly generated family of `size` people, in the same form
+    as `load_data` returns, whose pedigree is a tree: everyone but the
+    first couple either has both parents in the family or married into it,
+    and nobody marries a relative.
+    """
+    rng = random.Random(seed)
+    people = dict()
+
+    def add(mother=None, father=None):
+        name = f"Person{len(people)}"
+        trait = rng.random() < 0.5 if rng.random() < OBSERVED_TRAITS else None
+        people[name] = {
+            "name": name, "mother": mother, "father": father, "trait": trait
+        }
+        return name
+
+    unmarried = [add()]
+    while len(people) < size:
+        person = unmarried.pop(rng.randrange(len(unmarried)))
+        spouse = add()
+        mother, father = (person, spouse) if rng.random() < 0.5 else (spouse, person)
+        for _ in range(rng.randint(1, MAX_CHILDREN)):
+            if len(people) < size:
+                unmarried.append(add(mother, father))
+        if not unmarried:
+            unmarried.append(add())
+    return people
+
+
+def max_error(probabilities, exact):
+    """
+    Return the largest difference between any probability in
+    `probabilities` and in `exact`.
+    """
+    return max(
+        abs(probabilities[person][field][value] - exact[person][field][value])
+        for person in exact
+        for field in exact[person]
+        for value in exact[person][field]
+    )
+
+
+def benchmark_elimination(sizes):
+    """
+    Time `eliminate` on family trees of each size in `sizes`.
+    """
+    print("Variable elimination on family trees")
+    for size in sizes:
+        people = family_tree(size)
+        start = time.perf_counter()
+        eliminate(people)
+        elapsed = time.perf_counter() - start
+        print(
+            f"  {size} people: {elapsed:.3f}s, "
+            f"{elapsed / size * 1e6:.1f} us per person"
+        )
+
+
+def benchmark_enumeration(sizes):
+    """
+    Time enumeration in Gray code order on family trees of each size in
+    `sizes`, and in powerset order on those of at most `POWERSET_LIMIT`
+    people, and check both against variable elimination.
+    """
+    print("Enumeration on small family trees")
+    for size in sizes:
+        people = family_tree(size)
+        exact = eliminate(people)
+        methods = [("gray", gray_code_probabilities)]
+        if size <= POWERSET_LIMIT:
+            methods.append(("powerset", powerset_probabilities))
+        for name, method in methods:
+            start = time.perf_counter()
+            probabilities = method(people)
+            elapsed = time.perf_counter() - start
+            error = max_error(probabilities, exact)
+            print(
+                f"  {size} people, {name}: {elapsed:.3f}s, "
+                f"max error {error:.1e}"
+            )
+
+
+def benchmark_tables(sizes):
+    """
+    Time `table_probabilities` on family trees of each size in `sizes`,
+    and check it against variable elimination.
+    """
+    print("Vectorized joint probability tables on small family trees")
+    for size in sizes:
+        people = family_tree(size)
+        unknown = sum(1 for person in people if people[person]["trait"] is None)
+        assignments = 3 ** size * 2 ** unknown
+        exact = eliminate(people)
+        start = time.perf_counter()
+        probabilities = table_probabilities(people)
+        elapsed = time.perf_counter() - start
+        error = max_error(probabilities, exact)
+        print(
+            f"  {size} people: {elapsed:.3f}s, "
+            f"{assignments / elapsed / 1e6:.1f} million assignments per second, "
+            f"max error {error:.1e}"
+        )
+
+
+def benchmark_sampling(size, samples=SAMPLING_SAMPLES, tolerance=TOLERANCE,
+                       seed=0):
+    """
+    Time likelihood weighting and Gibbs sampling on the families in the
+    data directory, and with `samples` samples on a family tree of `size`
+    people, and check that they agree with variable elimination within
+    `tolerance`.
+    """
+    data = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+    families = [
+        (filename, load_data(os.path.join(data, filename)), SAMPLES)
+        for filename in sorted(os.listdir(data))
+    ]
+    families.append((f"{size} people", family_tree(size), samples))
+
+    print(f"Sampling (tolerance {tolerance})")
+    for name, people, n in families:
+        exact = eliminate(people)
+        for method in [likelihood_weighting, gibbs_sampling]:
+            start = time.perf_counter()
+            probabilities, ess = method(people, n, seed=seed)
+            elapsed = time.perf_counter() - start
+            error = max_error(probabilities, exact)
+            print(
+                f"  {name}, {method.__name__}, {n} samples: {elapsed:.3f}s, "
+                f"effective sample size {ess:.0f}, max error {error:.4f}"
+                f"{'' if error <= tolerance else ' (out of tolerance)'}"
+            )
+
+
+def write_families(filename, families):
+    """
+    Write `families`, a dictionary mapping family ids to their people, to
+    a CSV file with a family column that `load_families` can read.
+    """
+    with open(filename, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["family", "name", "mother", "father", "trait"])
+        for family, people in families.items():
+            for person in people.values():
+                trait = person["trait"]
+                writer.writerow([
+                    family, person["name"], person["mother"] or "",
+                    person["father"] or "", "" if trait is None else int(trait)
+                ])
+
+
+def benchmark_batch(count, processes=None, seed=0):
+    """
+    Time loading and inferring `count` family trees of random sizes in
+    `BATCH_SIZES` from a single CSV file with `batch_probabilities`.
+    """
+    rng = random.Random(seed)
+    families = {
+        f"Family{k}": family_tree(rng.randint(*BATCH_SIZES), seed + k)
+        for k in range(count)
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "families.csv")
+        write_families(filename, families)
+        start = time.perf_counter()
+        timings = batch_probabilities(
+            load_families(filename), os.path.join(directory, "output.npz"), processes
+        )
+        elapsed = time.perf_counter() - start
+
+    people = sum(len(people) for people in families.values())
+    slowest = max(timings, key=timings.get)
+    print(
+        f"Batch of {count} families ({people} people): {elapsed:.3f}s, "
+        f"{sum(timings.values()) / count * 1000:.2f} ms per family, "
+        f"slowest {slowest} {timings[slowest] * 1000:.2f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
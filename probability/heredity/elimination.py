@@ -0,0 +1,226 @@
+import heapq
+import itertools
+import sys
+
+from heredity import PROBS, load_data, pass_genes_prob, print_probabilities
+
+GENES = (2, 1, 0)
+
+
+def main():
+    # Check for proper usage
+    if len(sys.argv) != 2:
+        sys.exit("Usage: python elimination.py data.csv")
+    people = load_data(sys.argv[1])
+    print_probabilities(people, eliminate(people))
+
+
+class Factor():
+
+    def __init__(self, variables, values):
+        """
+        Create a factor over the gene counts of the people in `variables`.
+        `values` maps every tuple of gene counts, in the same order as
+        `variables`, to a non-negative weight.
+        """
+        self.variables = tuple(variables)
+        self.values = values
+
+    def marginal(self, variables):
+        """
+        Return this factor summed over every variable not in `variables`,
+        normalized so that its weights sum to 1.
+        """
+        index = [self.variables.index(variable) for variable in variables]
+        values = dict.fromkeys(itertools.product(GENES, repeat=len(variables)), 0)
+        for assignment, p in self.values.items():
+            values[tuple(assignment[i] for i in index)] += p
+        total = sum(values.values())
+        return Factor(variables, {
+            assignment: p / total for assignment, p in values.items()
+        })
+
+    def divide(self, other):
+        """
+        Return this factor divided by `other`, a factor over the same
+        variables in the same order, with 0 / 0 taken to be 0.
+        """
+        return Factor(self.variables, {
+            assignment: p / other.values[assignment] if p else 0
+            for assignment, p in self.values.items()
+        })
+
+
+def combine(variables, factors):
+    """
+    Return the product of `factors` as a Factor over `variables`, which
+    must include the variables of every factor.
+
+    The product is rescaled after each factor so that its largest weight
+    is 1, so that it can't underflow however many factors there are.
+    """
+    assignments = list(itertools.product(GENES, repeat=len(variables)))
+    values = [1] * len(assignments)
+    for factor in factors:
+        index = [variables.index(variable) for variable in factor.variables]
+        values = [
+            p * factor.values[tuple(assignment[i] for i in index)]
+            for p, assignment in zip(values, assignments)
+        ]
+        scale = max(values)
+        if scale > 0:
+            values = [p / scale for p in values]
+    return Factor(variables, dict(zip(assignments, values)))
+
+
+def gene_factors(people):
+    """
+    Return a list of Factors whose product is proportional to the joint
+    probability of everyone's gene count and the observed traits.
+
+    Each person has one factor: their gene count's probability given
+    their parents' gene counts, or unconditionally if their parents are
+    unknown, times the probability of their trait if it is known.
+    Unknown traits are summed out, which leaves a factor of 1.
+    """
+    factors = []
+    for person in people:
+        trait = people[person]["trait"]
+        evidence = {
+            genes: 1 if trait is None else PROBS["trait"][genes][trait]
+            for genes in GENES
+        }
+        mother = people[person]["mother"]
+        father = people[person]["father"]
+        if mother is not None and father is not None:
+            factors.append(Factor((person, mother, father), {
+                (genes, mother_genes, father_genes):
+                    pass_genes_prob(genes, mother_genes, father_genes) * evidence[genes]
+                for genes, mother_genes, father_genes
+                in itertools.product(GENES, repeat=3)
+            }))
+        else:
+            factors.append(Factor((person,), {
+                (genes,): PROBS["gene"][genes] * evidence[genes]
+                for genes in GENES
+            }))
+    return factors
+
+
+def elimination_cliques(people):
+    """
+    Choose an order in which to eliminate everyone's gene count, and
+    return a tuple `(order, cliques)`.
+
+    `order` is a list of people, each eliminated when they have the fewest
+    remaining neighbours in the moral graph, where every person is linked
+    to their parents and parents are linked to each other. This eliminates
+    a family tree from its leaves inwards, so that no clique has more than
+    three people in it.
+
+    `cliques` maps each person to a tuple of that person followed by their
+    neighbours when they were eliminated, in elimination order, so that
+    the second person (if any) is the parent of the clique in the
+    resulting clique tree.
+    """
+    neighbours = {person: set() for person in people}
+    for person in people:
+        mother = people[person]["mother"]
+        father = people[person]["father"]
+        if mother is not None and father is not None:
+            for a, b in [(person, mother), (person, father), (mother, father)]:
+                neighbours[a].add(b)
+                neighbours[b].add(a)
+
+    counter = itertools.count()
+    heap = [(len(neighbours[person]), next(counter), person) for person in people]
+    heapq.heapify(heap)
+    order = []
+    eliminated = dict()
+    while heap:
+        degree, _, person = heapq.heappop(heap)
+        if person in eliminated or degree != len(neighbours[person]):
+            continue
+        eliminated[person] = neighbours.pop(person)
+        order.append(person)
+
+        # Link the eliminated person's neighbours to each other
+        for neighbour in eliminated[person]:
+            neighbours[neighbour].discard(person)
+            neighbours[neighbour].update(eliminated[person] - {neighbour})
+            heapq.heappush(heap, (len(neighbours[neighbour]), next(counter), neighbour))
+
+    rank = {person: k for k, person in enumerate(order)}
+    cliques = {
+        person: (person,) + tuple(sorted(eliminated[person], key=rank.get))
+        for person in order
+    }
+    return order, cliques
+
+
+def eliminate(people):
+    """
+    Compute the gene and trait distribution of every person in `people`
+    by variable elimination, in time linear in the number of people for
+    families without marriages between relatives.
+
+    Everyone's distributions are computed at once by passing messages
+    both ways along the clique tree built by `elimination_cliques`.
+    Return a dictionary of the same form as `main` in heredity.py builds.
+    """
+    order, cliques = elimination_cliques(people)
+    rank = {person: k for k, person in enumerate(order)}
+
+    # Each factor goes to the clique of its first eliminated variable,
+    # which contains all its other variables
+    assigned = {person: [] for person in people}
+    for factor in gene_factors(people):
+        assigned[min(factor.variables, key=rank.get)].append(factor)
+
+    # Send a message from each clique to its parent, in elimination order
+    children = {person: [] for person in people}
+    beliefs = dict()
+    upward = dict()
+    for person in order:
+        clique = cliques[person]
+        beliefs[person] = combine(clique, assigned[person] + [
+            upward[child] for child in children[person]
+        ])
+        if len(clique) > 1:
+            upward[person] = beliefs[person].marginal(clique[1:])
+            children[clique[1]].append(person)
+
+    # Send a message from each clique to its children, in reverse order
+    downward = dict()
+    probabilities = dict()
+    for person in reversed(order):
+        clique = cliques[person]
+        belief = beliefs[person]
+        if len(clique) > 1:
+            belief = combine(clique, [belief, downward.pop(person)])
+        for child in children[person]:
+            separator = cliques[child][1:]
+            downward[child] = belief.marginal(separator).divide(upward[child])
+
+        genes = belief.marginal((person,))
+        probabilities[person] = {
+            "gene": {g: genes.values[(g,)] for g in GENES},
+            "trait": trait_distribution(people[person]["trait"], genes)
+        }
+
+    return {person: probabilities[person] for person in people}
+
+
+def trait_distribution(trait, genes):
+    """
+    Return the trait distribution of a person whose trait is `trait`
+    (or None if unknown), given their gene count distribution `genes`.
+    """
+    if trait is not None:
+        return {True: float(trait), False: float(not trait)}
+    p = sum(genes.values[(g,)] * PROBS["trait"][g][True] for g in GENES)
+    return {True: p, False: 1 - p}
+
+
+if __name__ == "__main__":
+    main()
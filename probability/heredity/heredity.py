@@ -1,5 +1,6 @@
 import csv
 import itertools
+import math
 import sys
 
 PROBS = {
@@ -39,12 +40,28 @@ PROBS = {
 
 def main():
     # Check for proper usage
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python heredity.py data.csv")
+    if len(sys.argv) not in [2, 3]:
+        sys.exit("Usage: python heredity.py data.csv [powerset|gray]")
+    method = sys.argv[2] if len(sys.argv) == 3 else "powerset"
+    if method not in ["powerset", "gray"]:
+        sys.exit(f"Unknown enumeration method: {method}")
     people = load_data(sys.argv[1])
 
-    # Keep track of gene and trait probabilities for each person
-    probabilities = {
+    if method == "gray":
+        probabilities = gray_code_probabilities(people)
+    else:
+        probabilities = powerset_probabilities(people)
+
+    # Print results
+    print_probabilities(people, probabilities)
+
+
+def empty_probabilities(people):
+    """
+    Return a dictionary of gene and trait probabilities for each person,
+    all set to 0.
+    """
+    return {
         person: {
             "gene": {
                 2: 0,
@@ -59,6 +76,15 @@ def main():
         for person in people
     }
 
+
+def powerset_probabilities(people):
+    """
+    Compute everyone's gene and trait distributions by summing the joint
+    probability of every possible assignment of genes and traits.
+    """
+    # Keep track of gene and trait probabilities for each person
+    probabilities = empty_probabilities(people)
+
     # Loop over all sets of people who might have the trait
     names = set(people)
     for have_trait in powerset(names):
@@ -81,8 +107,144 @@ def main():
 
     # Ensure probabilities sum to 1
     normalize(probabilities)
+    return probabilities
 
-    # Print results
+
+def gray_code_probabilities(people):
+    """
+    Compute everyone's gene and trait distributions like
+    `powerset_probabilities`, but without generating any assignment that
+    contradicts the evidence or building any list of subsets.
+
+    Observed traits are fixed, and unobserved traits are summed out of
+    each person's term of the joint probability, since nobody's
+    probabilities depend on them. Gene counts are then enumerated lazily
+    in reflected Gray code order, where each assignment changes one
+    person's gene count, so only the terms of that person and their
+    children are looked up again and the rest of the product is reused.
+    """
+    names = list(people)
+    index = {person: i for i, person in enumerate(names)}
+
+    # Each person's term as a flat table indexed by 9 times their gene
+    # count plus 3 times their mother's plus their father's. People with
+    # unknown parents count as their own parents, so that every term is
+    # looked up the same way
+    parents = []
+    tables = []
+    children = [[] for _ in names]
+    for i, person in enumerate(names):
+        trait = people[person]["trait"]
+        mother = people[person]["mother"]
+        father = people[person]["father"]
+        table = [0] * 27
+        if mother is not None and father is not None:
+            parents.append((index[mother], index[father]))
+            children[index[mother]].append(i)
+            children[index[father]].append(i)
+            for genes, mother_genes, father_genes in itertools.product(PROBS["gene"], repeat=3):
+                table[9 * genes + 3 * mother_genes + father_genes] = \
+                    pass_genes_prob(genes, mother_genes, father_genes)
+        else:
+            parents.append((i, i))
+            for genes in PROBS["gene"]:
+                table[13 * genes] = PROBS["gene"][genes]
+        if trait is not None:
+            for key in range(27):
+                table[key] *= PROBS["trait"][key // 9][trait]
+        tables.append(table)
+
+    def term(i):
+        mother, father = parents[i]
+        return tables[i][9 * genes[i] + 3 * genes[mother] + genes[father]]
+
+    # Only gene counts that the person's own trait allows are enumerated
+    domains = [
+        [genes for genes in (0, 1, 2) if any(tables[i][9 * genes:9 * genes + 9])]
+        for i in range(len(names))
+    ]
+    genes = [domain[0] for domain in domains]
+    terms = [term(i) for i in range(len(names))]
+
+    # Keep the product of the nonzero terms and the number of zero terms,
+    # so that a term can be replaced by dividing it out of the product
+    product = math.prod(p for p in terms if p)
+    zeros = sum(1 for p in terms if not p)
+
+    # A person's gene count only changes between assignments, so the
+    # joint probabilities summed since their last change all belong to
+    # their current gene count
+    total = 0
+    since = [0] * len(names)
+    gene_totals = [dict.fromkeys((2, 1, 0), 0) for _ in names]
+    varying = [i for i, domain in enumerate(domains) if len(domain) > 1]
+    total += product if not zeros else 0
+    for position, digit in gray_code([len(domains[i]) for i in varying]):
+        i = varying[position]
+        gene_totals[i][genes[i]] += total - since[i]
+        since[i] = total
+        genes[i] = domains[i][digit]
+
+        for k in [i] + children[i]:
+            new = term(k)
+            if terms[k]:
+                product /= terms[k]
+            else:
+                zeros -= 1
+            if new:
+                product *= new
+            else:
+                zeros += 1
+            terms[k] = new
+        total += product if not zeros else 0
+
+    probabilities = empty_probabilities(people)
+    for i, person in enumerate(names):
+        gene_totals[i][genes[i]] += total - since[i]
+        trait = people[person]["trait"]
+        for genes_count, p in gene_totals[i].items():
+            probabilities[person]["gene"][genes_count] = p
+            if trait is None:
+                for value in (True, False):
+                    probabilities[person]["trait"][value] += (
+                        p * PROBS["trait"][genes_count][value]
+                    )
+            else:
+                probabilities[person]["trait"][trait] += p
+    normalize(probabilities)
+    return probabilities
+
+
+def gray_code(radices):
+    """
+    Generate the numbers with the given mixed `radices`, digit by digit,
+    in reflected Gray code order starting from 0, where each number
+    differs from the last in a single digit by 1.
+
+    Every radix must be at least 2. Yield the position and new value of
+    the changed digit for each number after the first.
+    """
+    n = len(radices)
+    digits = [0] * n
+    directions = [1] * n
+    focus = list(range(n + 1))
+    while True:
+        j = focus[0]
+        focus[0] = 0
+        if j == n:
+            return
+        digits[j] += directions[j]
+        if digits[j] == 0 or digits[j] == radices[j] - 1:
+            directions[j] = -directions[j]
+            focus[j] = focus[j + 1]
+            focus[j + 1] = j + 1
+        yield j, digits[j]
+
+
+def print_probabilities(people, probabilities):
+    """
+    Print the gene and trait distributions of every person in `people`.
+    """
     for person in people:
         print(f"{person}:")
         for field in probabilities[person]:
@@ -103,17 +265,24 @@ def load_data(filename):
     with open(filename) as f:
         reader = csv.DictReader(f)
         for row in reader:
-            name = row["name"]
-            data[name] = {
-                "name": name,
-                "mother": row["mother"] or None,
-                "father": row["father"] or None,
-                "trait": (True if row["trait"] == "1" else
-                          False if row["trait"] == "0" else None)
-            }
+            data[row["name"]] = parse_person(row)
     return data
 
 
+def parse_person(row):
+    """
+    Return the data of the person in a row of a CSV file read by
+    `load_data`.
+    """
+    return {
+        "name": row["name"],
+        "mother": row["mother"] or None,
+        "father": row["father"] or None,
+        "trait": (True if row["trait"] == "1" else
+                  False if row["trait"] == "0" else None)
+    }
+
+
 def powerset(s):
     """
     Return a list of all possible subsets of set s.
@@ -0,0 +1,310 @@
+import sys
+
+import numpy as np
+
+from heredity import PROBS, empty_probabilities, load_data, print_probabilities
+from vectorized import inheritance_table, person_tables, trait_table
+
+SAMPLES = 10 ** 6
+CHAINS = 100
+BURN_IN = 100
+BATCHES = 20
+BLOCK_SIZE = 2 ** 16
+
+
+def main():
+    # Check for proper usage
+    if len(sys.argv) not in [2, 3, 4]:
+        sys.exit("Usage: python sampling.py data.csv [weighting|gibbs] [samples]")
+    method = sys.argv[2] if len(sys.argv) >= 3 else "gibbs"
+    if method not in ["weighting", "gibbs"]:
+        sys.exit(f"Unknown sampling method: {method}")
+    samples = int(sys.argv[3]) if len(sys.argv) == 4 else SAMPLES
+    people = load_data(sys.argv[1])
+
+    if method == "weighting":
+        probabilities, ess = likelihood_weighting(people, samples)
+    else:
+        probabilities, ess = gibbs_sampling(people, samples)
+    print_probabilities(people, probabilities)
+    print(f"Effective sample size: {ess:.0f}")
+
+
+def sampling_tables(people):
+    """
+    Return a tuple `(names, parents, tables, traits)` for sampling the
+    family in `people`.
+
+    `parents` and `tables` are as returned by `person_tables`, except that
+    people whose parents are unknown have an extra person n, whose gene
+    count is always 0, as both parents, and their unconditional gene
+    probabilities at entries `9 * genes` of `tables`. `traits` has each
+    person's observed trait, or -1 if unknown.
+    """
+    names, parents, tables = person_tables(people)
+    n = len(names)
+    founders = parents[:, 0] == np.arange(n)
+    parents[founders] = n
+    tables[founders] = 0
+    for genes in range(3):
+        tables[founders, 9 * genes] = PROBS["gene"][genes]
+    traits = np.array([
+        -1 if people[person]["trait"] is None else int(people[person]["trait"])
+        for person in names
+    ])
+    return names, parents, tables, traits
+
+
+def generations(parents):
+    """
+    Return a list of arrays of people, where everyone's parents are in
+    an earlier array than their own, so everyone in an array can be
+    sampled at once given the earlier ones.
+    """
+    n = len(parents)
+    depth = np.full(n + 1, -1)
+    for person in range(n):
+        stack = [person]
+        while stack:
+            i = stack[-1]
+            if depth[i] >= 0:
+                stack.pop()
+                continue
+            missing = [p for p in parents[i] if p < n and depth[p] < 0]
+            if missing:
+                stack.extend(missing)
+            else:
+                depth[i] = depth[parents[i]].max() + 1
+                stack.pop()
+    return [np.flatnonzero(depth[:n] == d) for d in range(depth.max() + 1)]
+
+
+def color_classes(parents):
+    """
+    Return a list of arrays of people, where nobody in an array is the
+    parent, child or co-parent of anyone else in it, so everyone in an
+    array can be resampled at once given everyone else.
+    """
+    n = len(parents)
+    neighbours = [set() for _ in range(n)]
+    for child, (mother, father) in enumerate(parents):
+        if mother < n:
+            for a, b in [(child, mother), (child, father), (mother, father)]:
+                neighbours[a].add(b)
+                neighbours[b].add(a)
+
+    colors = np.empty(n, dtype=np.int64)
+    for person in range(n):
+        used = {colors[neighbour] for neighbour in neighbours[person] if neighbour < person}
+        colors[person] = next(c for c in range(len(used) + 1) if c not in used)
+    return [np.flatnonzero(colors == c) for c in range(colors.max() + 1)]
+
+
+def sample_categorical(rng, weights):
+    """
+    Return an array with one index sampled from each row along the last
+    axis of `weights`, with probability proportional to the row's weights.
+    """
+    cumulative = np.cumsum(weights, axis=-1)
+    u = rng.random(cumulative.shape[:-1]) * cumulative[..., -1]
+    return np.minimum(
+        (cumulative < u[..., np.newaxis]).sum(axis=-1), weights.shape[-1] - 1
+    )
+
+
+def gene_weights(members, genes, parents, tables):
+    """
+    Return an array with an entry for each sample of `genes` and each of
+    `members`, holding the probability of each of their gene counts given
+    their parents'.
+    """
+    keys = 3 * genes[:, parents[members, 0]] + genes[:, parents[members, 1]]
+    return tables[members[:, np.newaxis], keys[..., np.newaxis] + 9 * np.arange(3)]
+
+
+def ancestral_sample(rng, size, parents, tables, traits, levels):
+    """
+    Return a tuple `(genes, sampled)` of `size` samples of everyone's
+    gene count and trait drawn from parents to children, a generation in
+    `levels` at a time, ignoring the evidence. `genes` has an extra
+    column for the parents of people whose parents are unknown.
+    """
+    n = len(parents)
+    genes = np.zeros((size, n + 1), dtype=np.int64)
+    for members in levels:
+        genes[:, members] = sample_categorical(
+            rng, gene_weights(members, genes, parents, tables)
+        )
+    has_trait = rng.random((size, n)) < trait_table()[genes[:, :n], 1]
+    sampled = np.where(traits >= 0, traits, has_trait.astype(np.int64))
+    return genes, sampled
+
+
+def likelihood_weighting(people, samples=SAMPLES, block_size=BLOCK_SIZE,
+                         seed=None):
+    """
+    Estimate everyone's gene and trait distributions by likelihood
+    weighting, and return a tuple `(probabilities, ess)`.
+
+    Every sample draws everyone's gene count given their parents', and
+    unknown traits given the gene count, a generation at a time for
+    `block_size` samples at once. Each sample is weighted by the
+    probability of the observed traits given its gene counts, kept in
+    logarithms so that large families can't underflow. `ess` is the
+    effective sample size of the weights, (sum of weights) ** 2 / (sum of
+    squared weights), which collapses as more traits are observed.
+    """
+    rng = np.random.default_rng(seed)
+    names, parents, tables, traits = sampling_tables(people)
+    n = len(names)
+    levels = generations(parents)
+    log_trait = np.log(trait_table())
+    observed = np.flatnonzero(traits >= 0)
+
+    # Running sums are kept relative to the largest log weight so far
+    largest = -np.inf
+    gene_counts = np.zeros(3 * n)
+    trait_counts = np.zeros(2 * n)
+    total = 0
+    squares = 0
+    gene_bins = 3 * np.arange(n)
+    trait_bins = 2 * np.arange(n)
+
+    for start in range(0, samples, block_size):
+        size = min(block_size, samples - start)
+        genes, sampled = ancestral_sample(rng, size, parents, tables, traits, levels)
+        genes = genes[:, :n]
+
+        log_weights = log_trait[genes[:, observed], traits[observed]].sum(axis=1)
+        block_largest = log_weights.max()
+        if block_largest > largest:
+            scale = np.exp(largest - block_largest)
+            gene_counts *= scale
+            trait_counts *= scale
+            total *= scale
+            squares *= scale ** 2
+            largest = block_largest
+        weights = np.exp(log_weights - largest)
+
+        repeated = np.repeat(weights, n)
+        gene_counts += np.bincount(
+            (gene_bins + genes).ravel(), repeated, minlength=3 * n
+        )
+        trait_counts += np.bincount(
+            (trait_bins + sampled).ravel(), repeated, minlength=2 * n
+        )
+        total += weights.sum()
+        squares += (weights ** 2).sum()
+
+    probabilities = sample_probabilities(people, names, gene_counts, trait_counts)
+    return probabilities, total ** 2 / squares
+
+
+def gibbs_sampling(people, samples=SAMPLES, chains=CHAINS, burn_in=BURN_IN,
+                   seed=None):
+    """
+    Estimate everyone's gene and trait distributions by Gibbs sampling,
+    and return a tuple `(probabilities, ess)`.
+
+    `chains` independent chains are advanced together, each starting
+    from a sample drawn from parents to children ignoring the evidence.
+    Each sweep resamples the gene count of everyone in a class of
+    `color_classes` at once given the rest of the family, class by class,
+    then their traits if unknown. After `burn_in` sweeps, sweeps are
+    counted until there are at least `samples` samples.
+
+    `ess` is the smallest effective sample size of anyone's gene count,
+    estimated by splitting every chain into `BATCHES` batches and
+    comparing the variance of the batch means with that of the samples.
+    """
+    rng = np.random.default_rng(seed)
+    names, parents, tables, traits = sampling_tables(people)
+    n = len(names)
+    inheritance = inheritance_table().ravel()
+    trait_probs = trait_table()
+
+    # A parent's term in their child's gene probability is entry
+    # 9 * child_genes + spouse_weight * spouse_genes + stride * genes
+    # of the inheritance table, with their children grouped by parent
+    children = [[] for _ in range(n)]
+    for child, (mother, father) in enumerate(parents):
+        if mother < n:
+            children[mother].append((child, father, 1, 3))
+            children[father].append((child, mother, 3, 1))
+    classes = []
+    for members in color_classes(parents):
+        edges = [
+            (position,) + edge
+            for position, person in enumerate(members)
+            for edge in children[person]
+        ]
+        edges = np.array(edges, dtype=np.int64).reshape(-1, 5)
+        with_children, starts = np.unique(edges[:, 0], return_index=True)
+        classes.append((members, edges[:, 1:], with_children, starts))
+
+    genes, sampled = ancestral_sample(
+        rng, chains, parents, tables, traits, generations(parents)
+    )
+
+    batch_length = max(1, -(-samples // (chains * BATCHES)))
+    gene_counts = np.zeros(3 * n)
+    trait_counts = np.zeros(2 * n)
+    batch_sums = np.zeros((BATCHES, chains, n))
+    squares = np.zeros(n)
+    gene_bins = 3 * np.arange(n)
+    trait_bins = 2 * np.arange(n)
+
+    for sweep in range(burn_in + BATCHES * batch_length):
+        for members, edges, with_children, starts in classes:
+            weights = gene_weights(members, genes, parents, tables)
+            weights = weights * trait_probs.T[sampled[:, members]]
+            if len(edges):
+                child, spouse, spouse_weight, stride = edges.T
+                keys = 9 * genes[:, child] + spouse_weight * genes[:, spouse]
+                terms = inheritance[keys[..., np.newaxis] + stride[:, np.newaxis] * np.arange(3)]
+                weights[:, with_children] *= np.multiply.reduceat(terms, starts, axis=1)
+            genes[:, members] = sample_categorical(rng, weights)
+            has_trait = rng.random((chains, len(members))) < trait_probs[genes[:, members], 1]
+            sampled[:, members] = np.where(traits[members] >= 0, traits[members], has_trait)
+
+        if sweep >= burn_in:
+            batch_sums[(sweep - burn_in) // batch_length] += genes[:, :n]
+            squares += (genes[:, :n] ** 2).sum(axis=0)
+            gene_counts += np.bincount((gene_bins + genes[:, :n]).ravel(), minlength=3 * n)
+            trait_counts += np.bincount((trait_bins + sampled).ravel(), minlength=2 * n)
+
+    draws = BATCHES * batch_length * chains
+    mean = batch_sums.sum(axis=(0, 1)) / draws
+    variance = squares / draws - mean ** 2
+    batch_variance = (batch_sums / batch_length).reshape(-1, n).var(axis=0)
+    mixing = variance > 1e-12
+    ess = draws
+    if mixing.any():
+        with np.errstate(divide="ignore"):
+            ess = np.min(
+                draws * variance[mixing] / (batch_length * batch_variance[mixing])
+            )
+
+    probabilities = sample_probabilities(people, names, gene_counts, trait_counts)
+    return probabilities, ess
+
+
+def sample_probabilities(people, names, gene_counts, trait_counts):
+    """
+    Return a dictionary of gene and trait distributions, of the form
+    `main` in heredity.py builds, from the (weighted) number of samples in
+    which each person of `names` had each gene count and trait.
+    """
+    probabilities = empty_probabilities(people)
+    for i, person in enumerate(names):
+        genes = gene_counts[3 * i:3 * i + 3]
+        for count in range(3):
+            probabilities[person]["gene"][count] = genes[count] / genes.sum()
+        trait = trait_counts[2 * i:2 * i + 2]
+        for value in (True, False):
+            probabilities[person]["trait"][value] = trait[int(value)] / trait.sum()
+    return probabilities
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+import sys
+
+import numpy as np
+
+from heredity import (
+    PROBS, empty_probabilities, load_data, normalize, pass_genes_prob,
+    print_probabilities
+)
+
+BLOCK_SIZE = 2 ** 16
+
+
+def main():
+    # Check for proper usage
+    if len(sys.argv) != 2:
+        sys.exit("Usage: python vectorized.py data.csv")
+    people = load_data(sys.argv[1])
+    print_probabilities(people, table_probabilities(people))
+
+
+def inheritance_table():
+    """
+    Return an array where entry `[genes, mother_genes, father_genes]` is
+    the probability of a gene count given the parents' gene counts.
+    """
+    return np.array([
+        [[pass_genes_prob(genes, mother_genes, father_genes)
+          for father_genes in range(3)]
+         for mother_genes in range(3)]
+        for genes in range(3)
+    ])
+
+
+def trait_table():
+    """
+    Return an array where entry `[genes, trait]` is the probability of
+    not having (0) or having (1) the trait given a gene count.
+    """
+    return np.array([
+        [PROBS["trait"][genes][False], PROBS["trait"][genes][True]]
+        for genes in range(3)
+    ])
+
+
+def person_tables(people):
+    """
+    Return a tuple `(names, parents, tables)` describing the joint
+    probability of a family as table lookups.
+
+    `parents` is an array with one row per person of `names`, holding the
+    indices of their mother and father, or their own index twice if their
+    parents are unknown. `tables` is an array with one row per person,
+    where entry `9 * genes + 3 * mother_genes + father_genes` is the
+    probability of the person's gene count given their parents'.
+    """
+    names = list(people)
+    index = {person: i for i, person in enumerate(names)}
+    genes = np.arange(27) // 9
+    mother_genes = np.arange(27) // 3 % 3
+    father_genes = np.arange(27) % 3
+    inheritance = inheritance_table().ravel()
+    prior = np.array([PROBS["gene"][count] for count in range(3)])
+    founder = np.where(
+        (genes == mother_genes) & (genes == father_genes), prior[genes], 0
+    )
+
+    parents = np.empty((len(names), 2), dtype=np.int64)
+    tables = np.empty((len(names), 27))
+    for i, person in enumerate(names):
+        mother = people[person]["mother"]
+        father = people[person]["father"]
+        if mother is not None and father is not None:
+            parents[i] = index[mother], index[father]
+            tables[i] = inheritance
+        else:
+            parents[i] = i, i
+            tables[i] = founder
+    return names, parents, tables
+
+
+def assignment_block(start, stop, radices):
+    """
+    Return an integer array with a row for each of the assignments numbered
+    `start` to `stop`, whose columns are the digits of the assignment's
+    number in the mixed `radices`, least significant first.
+    """
+    places = np.cumprod([1] + list(radices[:-1]), dtype=np.int64)
+    numbers = np.arange(start, stop, dtype=np.int64)
+    return numbers[:, np.newaxis] // places % np.asarray(radices, dtype=np.int64)
+
+
+def table_probabilities(people, block_size=BLOCK_SIZE):
+    """
+    Compute everyone's gene and trait distributions like
+    `powerset_probabilities` in heredity.py, but with NumPy.
+
+    Every assignment of a gene count to each person and a trait to each
+    person whose trait is unknown is numbered by its digits, and the
+    joint probability of a block of up to `block_size` assignments is
+    computed at once, as the product of one table lookup per person for
+    their genes and one for their trait.
+
+    The least significant digits run through every value within a block
+    and the others are constant, so the low digits are decoded once, the
+    lookups that only depend on them are shared by every block, and the
+    marginals are summed with `np.bincount` once all blocks are done.
+    """
+    names, parents, tables = person_tables(people)
+    n = len(names)
+    traits = [people[person]["trait"] for person in names]
+    unknown = [i for i in range(n) if traits[i] is None]
+    flat_tables = np.concatenate([tables.ravel(), trait_table().ravel()])
+
+    # The first n digits are gene counts and the rest are unknown traits,
+    # and each of the 2n lookups is at its start in `flat_tables` plus a
+    # linear combination of the digits. Observed traits are fixed, so
+    # only assignments consistent with them are numbered
+    radices = [3] * n + [2] * len(unknown)
+    coefficients = np.zeros((2 * n, len(radices)), dtype=np.int64)
+    starts = np.zeros(2 * n, dtype=np.int64)
+    for i in range(n):
+        coefficients[i, i] += 9
+        coefficients[i, parents[i, 0]] += 3
+        coefficients[i, parents[i, 1]] += 1
+        starts[i] = 27 * i
+        coefficients[n + i, i] = 2
+        starts[n + i] = 27 * n
+        if traits[i] is None:
+            coefficients[n + i, n + unknown.index(i)] = 1
+        else:
+            starts[n + i] += int(traits[i])
+
+    low = 0
+    while low < len(radices) and np.prod(radices[:low + 1]) <= block_size:
+        low += 1
+    low_digits = assignment_block(0, int(np.prod(radices[:low])), radices[:low])
+    blocks = int(np.prod(radices[low:]))
+    high_digits = assignment_block(0, blocks, radices[low:])
+    low_keys = starts + low_digits @ coefficients[:, :low].T
+    high_keys = high_digits @ coefficients[:, low:].T
+
+    mixed = coefficients[:, low:].any(axis=1)
+    low_p = np.prod(flat_tables[low_keys[:, ~mixed]], axis=1)
+    low_keys = low_keys[:, mixed]
+    high_keys = high_keys[:, mixed]
+
+    low_totals = np.zeros(len(low_digits))
+    block_totals = np.empty(blocks)
+    for block in range(blocks):
+        p = low_p * np.prod(flat_tables[low_keys + high_keys[block]], axis=1)
+        low_totals += p
+        block_totals[block] = p.sum()
+
+    def marginal(digit):
+        if digit < low:
+            return np.bincount(low_digits[:, digit], low_totals, radices[digit])
+        return np.bincount(high_digits[:, digit - low], block_totals, radices[digit])
+
+    probabilities = empty_probabilities(people)
+    for i, person in enumerate(names):
+        genes = marginal(i)
+        for count in range(3):
+            probabilities[person]["gene"][count] = genes[count]
+        if traits[i] is None:
+            trait = marginal(n + unknown.index(i))
+            for value in (True, False):
+                probabilities[person]["trait"][value] = trait[int(value)]
+        else:
+            probabilities[person]["trait"][traits[i]] = genes.sum()
+    normalize(probabilities)
+    return probabilities
+
+
+if __name__ == "__main__":
+    main()
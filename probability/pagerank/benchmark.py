@@ -0,0 +1,362 @@
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from crawler import crawl_graph
+from outofcore import file_pagerank
+from pagerank import DAMPING, crawl, iterate_pagerank, sample_pagerank, solve_pagerank
+from personalized import personalized_ranks, teleport_matrix
+from sampling import sample_graph
+from sparse import LinkGraph, incremental_pagerank, write_edges
+
+CORPORA = ["corpus0", "corpus1", "corpus2"]
+METHODS = ["jacobi", "gauss-seidel", "aitken", "quadratic"]
+CONVERGENCE_TOLERANCE = 1e-10
+SMALL_PAGES = 2000
+LARGE_PAGES = 1000000
+LINKS_PER_PAGE = 10
+SITE_SIZE = 1000
+EXTERNAL_LINKS = 0.001
+EDIT_FRACTION = 0.01
+PERSONALIZED_PAGES = 10000
+SEED_SETS = 1000
+SEEDS_PER_SET = 5
+OUT_OF_CORE_ITERATIONS = 5
+SAMPLE_PAGES = 100000
+SAMPLE_SIZES = [10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7, 10 ** 8]
+
+
+def main():
+    if len(sys.argv) not in [1, 2, 3, 4]:
+        sys.exit("Usage: python benchmark.py [pages [files [edge_list_pages]]]")
+    pages = int(sys.argv[1]) if len(sys.argv) >= 2 else LARGE_PAGES
+    files = int(sys.argv[2]) if len(sys.argv) >= 3 else LARGE_PAGES
+    edge_list_pages = int(sys.argv[3]) if len(sys.argv) == 4 else 10 * LARGE_PAGES
+
+    print("Largest difference from iterate_pagerank")
+    for directory in CORPORA:
+        corpus = crawl(directory)
+        expected = iterate_pagerank(corpus, DAMPING)
+        graph = LinkGraph.from_corpus(corpus)
+        ranks = graph.ranks_dict(graph.power_iteration(DAMPING))
+        difference = max(abs(ranks[page] - expected[page]) for page in corpus)
+        print(f"  {directory}: {difference:.6f}")
+
+    print(f"Iterations to an L1 change below {CONVERGENCE_TOLERANCE}")
+    for directory in CORPORA:
+        print(f"  {directory}:")
+        benchmark_convergence(crawl(directory))
+    print(f"  random graph with {SMALL_PAGES} pages:")
+    benchmark_convergence(graph_corpus(random_graph(SMALL_PAGES)))
+    print(f"  graph with {SMALL_PAGES} pages in sites of {SMALL_PAGES // 10}:")
+    benchmark_convergence(graph_corpus(site_graph(SMALL_PAGES, SMALL_PAGES // 10)))
+
+    print(f"Random graph with {SMALL_PAGES} pages")
+    graph = random_graph(SMALL_PAGES)
+    corpus = graph_corpus(graph)
+    start = time.perf_counter()
+    iterate_pagerank(corpus, DAMPING)
+    print(f"  iterate_pagerank: {time.perf_counter() - start:.3f}s")
+    benchmark_power_iteration(graph)
+
+    print(f"Random graph with {pages} pages")
+    benchmark_power_iteration(random_graph(pages))
+    print(f"Incremental update after editing {EDIT_FRACTION:.0%} of {pages} pages in sites")
+    benchmark_incremental(site_graph(pages))
+
+    print(f"Personalized PageRank for {SEED_SETS} seed sets on random graph with {PERSONALIZED_PAGES} pages")
+    benchmark_personalized(random_graph(PERSONALIZED_PAGES))
+
+    corpus = crawl("corpus2")
+    start = time.perf_counter()
+    sample_pagerank(corpus, DAMPING, SAMPLE_SIZES[1])
+    print(f"sample_pagerank on corpus2 (n = {SAMPLE_SIZES[1]}): {time.perf_counter() - start:.3f}s")
+    print("Parallel sampling on corpus2")
+    benchmark_sampling(LinkGraph.from_corpus(corpus))
+    print(f"Parallel sampling on random graph with {SAMPLE_PAGES} pages")
+    benchmark_sampling(random_graph(SAMPLE_PAGES))
+
+    print(f"Crawling synthetic corpus of {files} HTML files")
+    with tempfile.TemporaryDirectory() as directory:
+        write_corpus(directory, random_graph(files))
+        benchmark_crawl(directory)
+
+    print(f"Out-of-core power iteration on random graph with {pages} pages")
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "links.edges")
+        write_random_edges(filename, pages)
+        benchmark_out_of_core(filename, compare=True)
+
+    edges = edge_list_pages * LINKS_PER_PAGE
+    print(f"Out-of-core power iteration on edge list with {edges} links")
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "links.edges")
+        write_random_edges(filename, edge_list_pages)
+        benchmark_out_of_core(filename, OUT_OF_CORE_ITERATIONS)
+
+
+def random_graph(n, links_per_page=LINKS_PER_PAGE, seed=0):
+    """
+    Return a LinkGraph over `n` pages with `links_per_page` random links
+    from each page on average, where about 1 in 20 pages has no links.
+    """
+    rng = np.random.default_rng(seed)
+    sources = rng.integers(0, n, n * links_per_page)
+    targets = rng.integers(0, n, n * links_per_page)
+    keep = (sources != targets) & (sources % 20 != 0)
+    links = np.unique(np.stack([sources[keep], targets[keep]]), axis=1)
+    return LinkGraph(range(n), links[0], links[1])
+
+
+def graph_corpus(graph):
+    """
+    Return `graph` as a corpus dictionary, like `crawl` does.
+    """
+    corpus = {page: set() for page in graph.pages}
+    for source, target in zip(graph.sources.tolist(), graph.targets.tolist()):
+        corpus[graph.pages[source]].add(graph.pages[target])
+    return corpus
+
+
+def benchmark_convergence(corpus):
+    """
+    Print the iterations and time taken by `solve_pagerank` with each
+    method to converge on `corpus`, and the L1 distance of its result
+    from sparse power iteration.
+    """
+    graph = LinkGraph.from_corpus(corpus)
+    expected = graph.ranks_dict(graph.power_iteration(DAMPING))
+    for method in METHODS:
+        result = solve_pagerank(
+            corpus, DAMPING, CONVERGENCE_TOLERANCE, norm="l1", method=method
+        )
+        error = sum(abs(result.ranks[page] - expected[page]) for page in corpus)
+        print(
+            f"    {method}: {result.iterations} iterations, "
+            f"{result.elapsed:.3f}s, L1 error {error:.2e}"
+        )
+
+
+def benchmark_power_iteration(graph):
+    """
+    Print time taken by sparse power iteration on `graph`.
+    """
+    start = time.perf_counter()
+    graph.power_iteration(DAMPING)
+    print(
+        f"  power_iteration ({len(graph.sources)} links): "
+        f"{time.perf_counter() - start:.3f}s"
+    )
+
+
+def site_graph(n, site_size=SITE_SIZE, links_per_page=LINKS_PER_PAGE,
+               external=EXTERNAL_LINKS, seed=0):
+    """
+    Return a LinkGraph over `n` pages grouped into sites of `site_size`
+    consecutive pages, like `random_graph` but where all except an
+    `external` fraction of links stay within a site, and links favour the
+    first pages of a site, or of the whole graph for external links.
+    """
+    rng = np.random.default_rng(seed)
+    sources = rng.integers(0, n, n * links_per_page)
+    within = sources - sources % site_size + (site_size * rng.random(len(sources)) ** 3).astype(np.int64)
+    anywhere = (n * rng.random(len(sources)) ** 3).astype(np.int64)
+    targets = np.where(
+        rng.random(len(sources)) < external, anywhere, np.minimum(within, n - 1)
+    )
+    keep = (sources != targets) & (sources % 20 != 0)
+    links = np.unique(np.stack([sources[keep], targets[keep]]), axis=1)
+    return LinkGraph(range(n), links[0], links[1])
+
+
+def edit_graph(graph, fraction=EDIT_FRACTION, clustered=False, seed=1):
+    """
+    Return a copy of `graph` where the links from a `fraction` of pages,
+    chosen at random or as one run of consecutive pages if `clustered`,
+    are shuffled among those pages.
+    """
+    rng = np.random.default_rng(seed)
+    n = len(graph)
+    if clustered:
+        size = int(n * fraction)
+        first = rng.integers(0, n - size + 1)
+        edited = (np.arange(n) >= first) & (np.arange(n) < first + size)
+    else:
+        edited = rng.random(n) < fraction
+    keep = ~edited[graph.sources]
+    sources = graph.sources[~keep]
+    targets = rng.permutation(graph.targets[~keep])
+    links = np.unique(np.stack([
+        np.concatenate([graph.sources[keep], sources[sources != targets]]),
+        np.concatenate([graph.targets[keep], targets[sources != targets]])
+    ]), axis=1)
+    return LinkGraph(graph.pages, links[0], links[1])
+
+
+def benchmark_incremental(graph):
+    """
+    Print time taken to recompute PageRank after random and clustered
+    edits to `graph`, from scratch and incrementally from the ranks before
+    the edit, and the L1 distance of each incremental result from the full
+    recompute.
+    """
+    previous_ranks = graph.power_iteration(DAMPING)
+    for clustered in [False, True]:
+        edited = edit_graph(graph, clustered=clustered)
+        print(f"  {'clustered' if clustered else 'random'} edit:")
+
+        start = time.perf_counter()
+        expected = edited.power_iteration(DAMPING)
+        print(f"    full recompute: {time.perf_counter() - start:.3f}s")
+
+        start = time.perf_counter()
+        changed = edited.changed_pages(graph)
+        print(f"    diff ({len(changed)} pages changed): {time.perf_counter() - start:.3f}s")
+
+        for local in [False, True]:
+            start = time.perf_counter()
+            ranks = incremental_pagerank(edited, graph, previous_ranks, DAMPING, local=local)
+            elapsed = time.perf_counter() - start
+            error = np.abs(ranks - expected).sum()
+            name = "local update" if local else "warm start"
+            print(f"    {name}: {elapsed:.3f}s, L1 error {error:.2e}")
+
+
+def benchmark_personalized(graph, seed=0):
+    """
+    Print time taken to compute personalized PageRank for random seed sets
+    one at a time and all together, and the largest L1 distance between
+    the two.
+    """
+    rng = np.random.default_rng(seed)
+    seed_sets = [
+        rng.choice(len(graph), SEEDS_PER_SET, replace=False).tolist()
+        for _ in range(SEED_SETS)
+    ]
+    teleport = teleport_matrix(graph, seed_sets)
+
+    start = time.perf_counter()
+    expected = np.stack([
+        personalized_ranks(graph, teleport[:, k], DAMPING)
+        for k in range(SEED_SETS)
+    ], axis=1)
+    print(f"  one at a time: {time.perf_counter() - start:.3f}s")
+
+    start = time.perf_counter()
+    ranks = personalized_ranks(graph, teleport, DAMPING)
+    elapsed = time.perf_counter() - start
+    error = np.abs(ranks - expected).sum(axis=0).max()
+    print(f"  batched: {elapsed:.3f}s, L1 difference {error:.2e}")
+
+
+def benchmark_sampling(graph):
+    """
+    Print time taken by parallel sampling on `graph` for each sample size,
+    and the L1 distance of its estimate from power iteration.
+    """
+    expected = graph.power_iteration(DAMPING)
+    for n in SAMPLE_SIZES:
+        start = time.perf_counter()
+        ranks = sample_graph(graph, DAMPING, n, seed=0)
+        elapsed = time.perf_counter() - start
+        error = np.abs(ranks - expected).sum()
+        print(f"  n = {n}: {elapsed:.3f}s, L1 error {error:.6f}")
+
+
+def write_corpus(directory, graph):
+    """
+    Write one HTML file to `directory` for each page of `graph`,
+    linking to the pages it links to in `graph`.
+    """
+    order = np.argsort(graph.sources, kind="stable")
+    targets = graph.targets[order].tolist()
+    offsets = np.cumsum(graph.out_degree).tolist()
+    start = 0
+    for page, end in enumerate(offsets):
+        links = "".join(
+            f'    <li><a href="{target}.html">{target}</a></li>\n'
+            for target in targets[start:end]
+        )
+        start = end
+        with open(os.path.join(directory, f"{page}.html"), "w") as f:
+            f.write(
+                f"<!DOCTYPE html>\n<html lang=\"en\">\n<head>\n"
+                f"    <title>{page}</title>\n</head>\n<body>\n"
+                f"<h1>{page}</h1>\n<ul>\n{links}</ul>\n</body>\n</html>\n"
+            )
+
+
+def benchmark_crawl(directory):
+    """
+    Print time taken by `crawl` and by `crawl_graph` with and without
+    its edge-list cache.
+    """
+    start = time.perf_counter()
+    crawl(directory)
+    print(f"  crawl: {time.perf_counter() - start:.3f}s")
+
+    cache = os.path.join(directory, "links.edges")
+    start = time.perf_counter()
+    crawl_graph(directory, cache=cache)
+    print(f"  crawl_graph: {time.perf_counter() - start:.3f}s")
+
+    start = time.perf_counter()
+    crawl_graph(directory, cache=cache)
+    print(f"  crawl_graph from cache: {time.perf_counter() - start:.3f}s")
+
+
+def write_random_edges(filename, n, links_per_page=LINKS_PER_PAGE,
+                       block_pages=LARGE_PAGES, seed=0):
+    """
+    Write an edge list to `filename` over `n` pages, where each page has
+    `links_per_page` links to it from random pages, and pages whose id is
+    a multiple of 20 have no links, without holding all links in memory.
+    """
+    rng = np.random.default_rng(seed)
+
+    def blocks():
+        for first in range(0, n, block_pages):
+            targets = np.arange(first, min(first + block_pages, n)).repeat(links_per_page)
+            sources = 20 * rng.integers(0, -(-n // 20), len(targets)) + rng.integers(1, 20, len(targets))
+            yield np.stack([np.minimum(sources, n - 1), targets], axis=1)
+
+    write_edges(filename, n, blocks(), n * links_per_page)
+
+
+def benchmark_out_of_core(filename, max_iterations=None, compare=False):
+    """
+    Print the time and I/O throughput of power iteration over the edge
+    list in `filename`, for at most `max_iterations` iterations, and if
+    `compare` is True, the time taken to load the graph and run power
+    iteration in memory, and the L1 distance between the two.
+    """
+    throughputs = []
+
+    def record(iteration, residual, size, elapsed):
+        throughputs.append(size / elapsed / 2 ** 20)
+
+    start = time.perf_counter()
+    if max_iterations is None:
+        _, ranks = file_pagerank(filename, DAMPING, progress=record)
+    else:
+        _, ranks = file_pagerank(filename, DAMPING, max_iterations=max_iterations, progress=record)
+    print(
+        f"  file_pagerank ({len(throughputs)} iterations): "
+        f"{time.perf_counter() - start:.3f}s, "
+        f"{np.mean(throughputs):.1f} MiB/s per iteration "
+        f"({min(throughputs):.1f} to {max(throughputs):.1f})"
+    )
+
+    if compare:
+        start = time.perf_counter()
+        graph, _ = LinkGraph.load(filename)
+        expected = graph.power_iteration(DAMPING)
+        error = np.abs(ranks - expected).sum()
+        print(f"  load and power_iteration: {time.perf_counter() - start:.3f}s, L1 difference {error:.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import hashlib
+import multiprocessing
+import os
+import re
+import sys
+
+import numpy as np
+
+from pagerank import DAMPING
+from sparse import LinkGraph, incremental_pagerank
+
+LINK = re.compile(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+CHUNK_SIZE = 64 * 1024
+BATCH_SIZE = 1000
+
+# Page ids of the corpus being crawled, shared with worker processes
+page_ids = dict()
+
+
+def main():
+    if len(sys.argv) not in [2, 3]:
+        sys.exit("Usage: python crawler.py corpus [cache]")
+    if len(sys.argv) == 3:
+        graph, ranks = update_pagerank(sys.argv[1], sys.argv[2], DAMPING)
+    else:
+        graph = crawl_graph(sys.argv[1])
+        ranks = graph.power_iteration(DAMPING)
+    ranks = graph.ranks_dict(ranks)
+    print(f"PageRank Results from Sparse Power Iteration")
+    for page in sorted(ranks):
+        print(f"  {page}: {ranks[page]:.4f}")
+
+
+def crawl_graph(directory, processes=None, cache=None):
+    """
+    Parse a directory of HTML pages and return a LinkGraph of the links
+    between them, like `crawl` does but with pages parsed in parallel by
+    `processes` worker processes (by default, one per CPU).
+
+    If `cache` is a filename, the graph is saved there as an edge list
+    along with a fingerprint of the corpus, and loaded from it instead of
+    parsing the pages again if the corpus hasn't changed since.
+    """
+    pages = sorted(
+        filename for filename in os.listdir(directory)
+        if filename.endswith(".html")
+    )
+    fingerprint = corpus_fingerprint(directory, pages)
+    if cache is not None and os.path.exists(cache):
+        graph, metadata = LinkGraph.load(cache)
+        if metadata == {"fingerprint": fingerprint}:
+            return graph
+
+    ids = {page: k for k, page in enumerate(pages)}
+    files = [(k, os.path.join(directory, page)) for k, page in enumerate(pages)]
+    batches = [
+        files[start:start + BATCH_SIZE]
+        for start in range(0, len(files), BATCH_SIZE)
+    ]
+
+    processes = processes or os.cpu_count()
+    if processes == 1:
+        set_page_ids(ids)
+        results = [parse_batch(batch) for batch in batches]
+    else:
+        with multiprocessing.Pool(processes, set_page_ids, (ids,)) as pool:
+            results = pool.map(parse_batch, batches)
+
+    sources = [np.zeros(0, dtype=np.int64)] + [result[0] for result in results]
+    targets = [np.zeros(0, dtype=np.int64)] + [result[1] for result in results]
+    graph = LinkGraph(pages, np.concatenate(sources), np.concatenate(targets))
+    if cache is not None:
+        graph.save(cache, {"fingerprint": fingerprint})
+    return graph
+
+
+def update_pagerank(directory, cache, damping_factor, local=False):
+    """
+    Crawl `directory` with `crawl_graph` using the edge-list `cache`, and
+    return a tuple `(graph, ranks)` with the PageRank of every page.
+
+    Ranks are saved alongside the cache. If the cache holds the graph and
+    ranks from a previous crawl, the new ranks are computed incrementally
+    from them with `incremental_pagerank` instead of from scratch.
+    """
+    ranks_file = cache + ".ranks.npy"
+    previous = None
+    if os.path.exists(cache) and os.path.exists(ranks_file):
+        previous, _ = LinkGraph.load(cache)
+        previous_ranks = np.load(ranks_file)
+        if len(previous_ranks) != len(previous):
+            previous = None
+
+    graph = crawl_graph(directory, cache=cache)
+    if previous is None:
+        ranks = graph.power_iteration(damping_factor)
+    else:
+        ranks = incremental_pagerank(
+            graph, previous, previous_ranks, damping_factor, local=local
+        )
+    np.save(ranks_file, ranks)
+    return graph, ranks
+
+
+def corpus_fingerprint(directory, pages):
+    """
+    Return a hash of the name, size and modification time of every page,
+    which changes whenever a page is added, removed or modified.
+    """
+    fingerprint = hashlib.sha256()
+    for page in pages:
+        stat = os.stat(os.path.join(directory, page))
+        fingerprint.update(f"{page}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+    return fingerprint.hexdigest()
+
+
+def set_page_ids(ids):
+    """
+    Set the page ids of the corpus being crawled, in a worker process.
+    """
+    global page_ids
+    page_ids = ids
+
+
+def parse_batch(batch):
+    """
+    Extract the links from a batch of `(page id, filename)` pairs.
+    Return arrays of the source and target page ids of every link to
+    another page in the corpus.
+    """
+    sources = []
+    targets = []
+    for source, filename in batch:
+        for link in extract_links(filename):
+            target = page_ids.get(link)
+            if target is not None and target != source:
+                sources.append(source)
+                targets.append(target)
+    return np.array(sources, dtype=np.int64), np.array(targets, dtype=np.int64)
+
+
+def extract_links(filename, chunk_size=CHUNK_SIZE):
+    """
+    Return the set of links in an HTML file, reading it in chunks of
+    `chunk_size` characters so that large files are never held in memory.
+    """
+    links = set()
+    carry = ""
+    with open(filename) as f:
+        while True:
+            chunk = f.read(chunk_size)
+            text = carry + chunk
+            end = 0
+            for match in LINK.finditer(text):
+                links.add(match.group(1))
+                end = match.end()
+            if not chunk:
+                return links
+
+            # Keep any tag that may continue into the next chunk
+            start = text.rfind("<", end)
+            carry = text[start:] if start != -1 else ""
+
+
+if __name__ == "__main__":
+    main()
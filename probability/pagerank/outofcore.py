@@ -0,0 +1,103 @@
+import sys
+import time
+
+import numpy as np
+
+from pagerank import DAMPING
+from sparse import MAX_ITERATIONS, TOLERANCE, LinkGraph
+
+# Links read from the edge list at a time
+BLOCK_EDGES = 2 ** 22
+TOP_PAGES = 10
+
+
+def main():
+    if len(sys.argv) != 2:
+        sys.exit("Usage: python outofcore.py edges")
+
+    def report(iteration, residual, size, elapsed):
+        print(
+            f"  iteration {iteration}: residual {residual:.2e}, "
+            f"{size / elapsed / 2 ** 20:.1f} MiB/s"
+        )
+
+    print("Power iteration over edge list")
+    pages, ranks = file_pagerank(sys.argv[1], DAMPING, progress=report)
+    print(f"PageRank Results from Out-of-Core Power Iteration (top {TOP_PAGES})")
+    for page in np.argsort(ranks)[::-1][:TOP_PAGES]:
+        name = pages[page] if isinstance(pages, list) else page
+        print(f"  {name}: {ranks[page]:.4f}")
+
+
+def file_pagerank(filename, damping_factor, tolerance=TOLERANCE,
+                  max_iterations=MAX_ITERATIONS, block_edges=BLOCK_EDGES,
+                  progress=None):
+    """
+    Return a tuple `(pages, ranks)` with the pages of the edge list in
+    `filename`, as written by `write_edges`, and an array of their PageRank
+    values, by power iteration until the L1 change between iterations is
+    below `tolerance`, or `max_iterations` iterations have run.
+
+    Links are read from a memory map of the file `block_edges` at a time,
+    so only arrays with one value per page are held in memory. After each
+    iteration, `progress` is called if given with the iteration number,
+    the L1 change, the number of bytes of links read and the seconds taken.
+    """
+    header, edges = LinkGraph.read_edges(filename)
+    pages = header["pages"]
+    n = pages if isinstance(pages, int) else len(pages)
+
+    # Pages without links are treated as linking to every page
+    out_degree = np.zeros(n)
+    for sources, _ in edge_blocks(edges, block_edges):
+        add_counts(out_degree, sources)
+    dangling = out_degree == 0
+    link_weights = np.zeros(n)
+    link_weights[~dangling] = 1 / out_degree[~dangling]
+    del out_degree
+
+    ranks = np.full(n, 1 / n)
+    for iteration in range(1, max_iterations + 1):
+        start = time.perf_counter()
+        weighted = ranks * link_weights
+        new_ranks = np.zeros(n)
+        for sources, targets in edge_blocks(edges, block_edges):
+            add_counts(new_ranks, targets, weighted[sources])
+        new_ranks *= damping_factor
+        new_ranks += (1 - damping_factor + damping_factor * ranks[dangling].sum()) / n
+
+        residual = np.abs(new_ranks - ranks).sum()
+        ranks = new_ranks
+        if progress is not None:
+            progress(iteration, residual, edges.nbytes, time.perf_counter() - start)
+        if residual < tolerance:
+            break
+
+    return pages, ranks
+
+
+def edge_blocks(edges, block_edges):
+    """
+    Yield tuples `(sources, targets)` of arrays of the page ids of
+    consecutive blocks of at most `block_edges` links from `edges`.
+    """
+    for start in range(0, len(edges), block_edges):
+        block = np.array(edges[start:start + block_edges])
+        yield block[:, 0], block[:, 1]
+
+
+def add_counts(totals, indices, weights=None):
+    """
+    Add the number of times each page appears in `indices` (or the sum of
+    its `weights`) to `totals`, counting only over the range of pages in
+    `indices`, which is narrow when links are sorted by target.
+    """
+    if len(indices) == 0:
+        return
+    low = indices.min()
+    high = indices.max() + 1
+    totals[low:high] += np.bincount(indices - low, weights, minlength=high - low)
+
+
+if __name__ == "__main__":
+    main()
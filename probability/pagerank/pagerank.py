@@ -1,10 +1,23 @@
+import math
 import os
 import random
 import re
 import sys
+import time
 
 DAMPING = 0.85
 SAMPLES = 10000
+TOLERANCE = 0.001
+MAX_ITERATIONS = 1000
+
+# Iterations between extrapolations by the "aitken" and "quadratic" methods
+EXTRAPOLATION_PERIOD = 10
+
+NORMS = {
+    "l1": lambda differences: sum(abs(d) for d in differences),
+    "l2": lambda differences: math.sqrt(sum(d * d for d in differences)),
+    "max": lambda differences: max((abs(d) for d in differences), default=0)
+}
 
 
 def main():
@@ -110,30 +123,179 @@ def iterate_pagerank(corpus, damping_factor):
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
     """
-    n = len(corpus)
-    ranks = {}
-    for page in corpus:
-        ranks[page] = 1 / n
-
-    repeat = True
-    while repeat:
-        old_ranks = ranks.copy()
-        for page in corpus:
-            ranks[page] = (1 - DAMPING) / n
-            for link in corpus:
-                if page in corpus[link]:
-                    num_links = len(corpus[link])
-                    ranks[page] += DAMPING * ranks[link] / num_links
-                if not corpus[link]:
-                    ranks[page] += DAMPING * ranks[link] / n
-
-        repeat = False
-        for rank in ranks:
-            if abs(ranks[rank] - old_ranks[rank]) > 0.001:
-                repeat = True
-                break
+    return solve_pagerank(corpus, damping_factor, method="gauss-seidel").ranks
 
-    return ranks
+
+class PageRankResult():
+    def __init__(self, ranks, iterations, residuals, elapsed, converged):
+        """
+        Create the result of solving for PageRank values: a dictionary of
+        `ranks` for each page, the number of `iterations` run, the list of
+        `residuals` after each iteration, the wall time `elapsed` in
+        seconds, and whether the last residual `converged` below the
+        tolerance.
+        """
+        self.ranks = ranks
+        self.iterations = iterations
+        self.residuals = residuals
+        self.elapsed = elapsed
+        self.converged = converged
+
+
+def solve_pagerank(corpus, damping_factor, tolerance=TOLERANCE, norm="max",
+                   max_iterations=MAX_ITERATIONS, method="jacobi"):
+    """
+    Return a PageRankResult for the pages in `corpus`, iterating until the
+    change in PageRank values between iterations, measured by `norm`
+    ("l1", "l2" or "max"), is below `tolerance`, or `max_iterations`
+    iterations have run.
+
+    `method` is one of:
+      - "jacobi": compute every page's new value from the old values.
+      - "gauss-seidel": update values in place, so pages later in each
+        sweep already use the new values of pages earlier in it (see
+        `gauss_seidel_sweep`).
+      - "aitken": like "jacobi", but every `EXTRAPOLATION_PERIOD`
+        iterations apply Aitken's delta-squared extrapolation to each
+        page's last three values.
+      - "quadratic": like "jacobi", but every `EXTRAPOLATION_PERIOD`
+        iterations extrapolate from the last four iterates, assuming the
+        error lies mostly along the next two eigenvectors.
+    """
+    if norm not in NORMS:
+        raise ValueError(f"unknown norm {norm}")
+    if method not in ["jacobi", "gauss-seidel", "aitken", "quadratic"]:
+        raise ValueError(f"unknown method {method}")
+    start = time.perf_counter()
+
+    # Pages linking to each page, with the probability of following the link
+    pages = list(corpus)
+    ids = {page: k for k, page in enumerate(pages)}
+    incoming = [[] for _ in pages]
+    for page in pages:
+        for link in corpus[page]:
+            incoming[ids[link]].append((ids[page], 1 / len(corpus[page])))
+    dangling = [not corpus[page] for page in pages]
+
+    ranks = [1 / len(pages)] * len(pages)
+    iterates = [ranks]
+    residuals = []
+    converged = False
+    for iteration in range(1, max_iterations + 1):
+        sweep = gauss_seidel_sweep if method == "gauss-seidel" else pagerank_sweep
+        new_ranks = sweep(ranks, incoming, dangling, damping_factor)
+        if method in ["aitken", "quadratic"]:
+            iterates = iterates[-3:] + [new_ranks]
+            if iteration % EXTRAPOLATION_PERIOD == 0:
+                extrapolated = (
+                    aitken_extrapolation(iterates) if method == "aitken"
+                    else quadratic_extrapolation(iterates)
+                )
+                if extrapolated is not None:
+                    new_ranks = extrapolated
+                    iterates = [new_ranks]
+
+        residuals.append(NORMS[norm]([new - old for new, old in zip(new_ranks, ranks)]))
+        ranks = new_ranks
+        if residuals[-1] < tolerance:
+            converged = True
+            break
+
+    total = sum(ranks)
+    return PageRankResult(
+        {page: rank / total for page, rank in zip(pages, ranks)},
+        len(residuals), residuals, time.perf_counter() - start, converged
+    )
+
+
+def pagerank_sweep(ranks, incoming, dangling, damping_factor):
+    """
+    Return new PageRank values for each page from `ranks`, given the
+    `(page, probability)` pairs of links `incoming` to each page and
+    whether each page is `dangling` (has no links, so links to every page).
+    """
+    n = len(ranks)
+    dangling_rank = sum(rank for rank, empty in zip(ranks, dangling) if empty)
+    new_ranks = []
+    for page in range(n):
+        rank = (1 - damping_factor + damping_factor * dangling_rank) / n
+        for link, probability in incoming[page]:
+            rank += damping_factor * ranks[link] * probability
+        new_ranks.append(rank)
+    return new_ranks
+
+
+def gauss_seidel_sweep(ranks, incoming, dangling, damping_factor):
+    """
+    Return new PageRank values for each page from `ranks`, like
+    `pagerank_sweep`, but updating values in order so that each new value
+    is used by the pages after it.
+
+    Rank spread from dangling pages couples every page to every other, so
+    the sweep instead updates values proportional to the ranks that solve
+    value = 1 + damping_factor * (value flowing in along links), then
+    normalizes them to sum to 1.
+    """
+    n = len(ranks)
+    dangling_rank = sum(rank for rank, empty in zip(ranks, dangling) if empty)
+    scale = n / (1 - damping_factor + damping_factor * dangling_rank)
+    values = [rank * scale for rank in ranks]
+    for page in range(n):
+        value = 1
+        for link, probability in incoming[page]:
+            value += damping_factor * values[link] * probability
+        values[page] = value
+    total = sum(values)
+    return [value / total for value in values]
+
+
+def aitken_extrapolation(iterates):
+    """
+    Return values extrapolated from the last three of `iterates` with
+    Aitken's delta-squared process applied to each page, normalized to
+    sum to 1, or None if there are fewer than three iterates.
+    """
+    if len(iterates) < 3:
+        return None
+    extrapolated = []
+    for x0, x1, x2 in zip(*iterates[-3:]):
+        denominator = x2 - 2 * x1 + x0
+        value = x2 - (x2 - x1) ** 2 / denominator if denominator != 0 else x2
+        extrapolated.append(value if value > 0 else x2)
+    total = sum(extrapolated)
+    return [value / total for value in extrapolated]
+
+
+def quadratic_extrapolation(iterates):
+    """
+    Return values extrapolated from the last four of `iterates` by
+    quadratic extrapolation (Kamvar et al., 2003), normalized to sum to 1,
+    or None if there are fewer than four iterates or they are degenerate.
+    """
+    if len(iterates) < 4:
+        return None
+    x0, x1, x2, x3 = iterates[-4:]
+    y1 = [b - a for a, b in zip(x0, x1)]
+    y2 = [b - a for a, b in zip(x0, x2)]
+    y3 = [b - a for a, b in zip(x0, x3)]
+
+    def dot(u, v):
+        return sum(a * b for a, b in zip(u, v))
+
+    # Least-squares solution of y1 g1 + y2 g2 = -y3
+    a, b, c = dot(y1, y1), dot(y1, y2), dot(y2, y2)
+    determinant = a * c - b * b
+    if determinant <= 1e-12 * a * c:
+        return None
+    g1 = (-c * dot(y1, y3) + b * dot(y2, y3)) / determinant
+    g2 = (b * dot(y1, y3) - a * dot(y2, y3)) / determinant
+
+    b0, b1, b2 = g1 + g2 + 1, g2 + 1, 1
+    extrapolated = [
+        max(b0 * p1 + b1 * p2 + b2 * p3, 0) for p1, p2, p3 in zip(x1, x2, x3)
+    ]
+    total = sum(extrapolated)
+    return [value / total for value in extrapolated]
 
 
 if __name__ == "__main__":
@@ -0,0 +1,135 @@
+import sys
+
+import numpy as np
+
+from pagerank import DAMPING, crawl
+from sparse import MAX_ITERATIONS, TOLERANCE, LinkGraph
+
+# Most rank values in each block of rank vectors that personalized_ranks
+# computes together
+BLOCK_ELEMENTS = 2 ** 21
+
+
+def main():
+    if len(sys.argv) < 3:
+        sys.exit("Usage: python personalized.py corpus page [page ...]")
+    corpus = crawl(sys.argv[1])
+    ranks = personalized_pagerank(corpus, sys.argv[2:], DAMPING)
+    print(f"Personalized PageRank Results for {', '.join(sys.argv[2:])}")
+    for page in sorted(ranks):
+        print(f"  {page}: {ranks[page]:.4f}")
+
+
+def teleport_matrix(graph, seed_sets):
+    """
+    Return a matrix with one column for each of `seed_sets`, holding the
+    probability of a surfer jumping to each page of `graph`.
+
+    Each seed set is either a collection of page names, jumped to with
+    equal probability, or a dictionary mapping page names to weights.
+    """
+    ids = {page: k for k, page in enumerate(graph.pages)}
+    teleport = np.zeros((len(graph), len(seed_sets)))
+    for column, seeds in enumerate(seed_sets):
+        if not isinstance(seeds, dict):
+            seeds = {page: 1 for page in seeds}
+        for page, weight in seeds.items():
+            teleport[ids[page], column] += weight
+        total = teleport[:, column].sum()
+        if total <= 0:
+            raise ValueError("teleport weights must have a positive sum")
+        teleport[:, column] /= total
+    return teleport
+
+
+def personalized_ranks(graph, teleport, damping_factor, tolerance=TOLERANCE,
+                       max_iterations=MAX_ITERATIONS):
+    """
+    Return PageRank values for each page of `graph` for surfers that jump
+    to pages drawn from `teleport` instead of uniformly, by power iteration
+    until the L1 change between iterations is below `tolerance`.
+
+    If `teleport` is a matrix with one distribution per column, return a
+    matrix with one column of ranks for each. Columns are iterated
+    together, so every step is one product of the sparse link matrix with
+    a dense block of ranks, and columns are dropped from the block as
+    they converge. When the distributions jump to fewer distinct pages
+    than there are columns, only the ranks for jumping to each of those
+    pages are computed, and then combined.
+    """
+    if teleport.ndim == 1:
+        return graph.power_iteration(
+            damping_factor, tolerance, max_iterations,
+            initial=teleport, teleport=teleport
+        )
+
+    seeds = np.flatnonzero(teleport.any(axis=1))
+    if len(seeds) < teleport.shape[1]:
+        # Ranks are proportional to the solution of a linear system in
+        # the teleport distribution, scaled by the rank of pages without
+        # links: undo the scaling, combine, and normalize again
+        basis = np.zeros((len(graph), len(seeds)))
+        basis[seeds, np.arange(len(seeds))] = 1
+        basis = personalized_ranks(
+            graph, basis, damping_factor, tolerance, max_iterations
+        )
+        basis /= 1 - damping_factor + damping_factor * basis[graph.dangling].sum(axis=0)
+        ranks = basis @ teleport[seeds]
+        return ranks / ranks.sum(axis=0)
+
+    ranks = np.empty_like(teleport)
+    dangling = np.flatnonzero(graph.dangling)
+    size = max(1, BLOCK_ELEMENTS // len(graph))
+    for start in range(0, teleport.shape[1], size):
+        current = teleport[:, start:start + size].copy()
+        columns = np.arange(current.shape[1])
+
+        # Teleport distributions jump to few pages, so only their nonzero
+        # entries are added at each step
+        rows, seeds = np.nonzero(current)
+        weights = current[rows, seeds]
+
+        for _ in range(max_iterations):
+            jump = 1 - damping_factor + damping_factor * current[dangling].sum(axis=0)
+            new_ranks = graph.linked(current)
+            new_ranks *= damping_factor
+            new_ranks[rows, seeds] += weights * jump[seeds]
+
+            current -= new_ranks
+            np.abs(current, out=current)
+            converged = current.sum(axis=0) < tolerance
+            current = new_ranks
+            if not converged.any():
+                continue
+
+            ranks[:, start + columns[converged]] = current[:, converged]
+            current = current[:, ~converged]
+            columns = columns[~converged]
+            if len(columns) == 0:
+                break
+            kept = ~converged[seeds]
+            rows = rows[kept]
+            seeds = (np.cumsum(~converged) - 1)[seeds[kept]]
+            weights = weights[kept]
+        ranks[:, start + columns] = current
+    return ranks
+
+
+def personalized_pagerank(corpus, seeds, damping_factor, tolerance=TOLERANCE):
+    """
+    Return PageRank values for each page in `corpus` for a surfer that,
+    instead of going to a random page, jumps to one of `seeds`: either a
+    collection of page names, or a dictionary mapping page names to
+    weights.
+
+    Return a dictionary where keys are page names, and values are
+    their estimated PageRank value (a value between 0 and 1). All
+    PageRank values should sum to 1.
+    """
+    graph = LinkGraph.from_corpus(corpus)
+    teleport = teleport_matrix(graph, [seeds])[:, 0]
+    return graph.ranks_dict(personalized_ranks(graph, teleport, damping_factor, tolerance))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import sys
+
+import numpy as np
+
+from pagerank import DAMPING, crawl
+from sparse import LinkGraph
+
+SAMPLES = 10 ** 8
+WALKERS = 100000
+BURN_IN = 100
+
+
+def main():
+    if len(sys.argv) not in [2, 3]:
+        sys.exit("Usage: python sampling.py corpus [samples]")
+    corpus = crawl(sys.argv[1])
+    samples = int(sys.argv[2]) if len(sys.argv) == 3 else SAMPLES
+    ranks = surfer_pagerank(corpus, DAMPING, samples)
+    print(f"PageRank Results from Parallel Sampling (n = {samples})")
+    for page in sorted(ranks):
+        print(f"  {page}: {ranks[page]:.4f}")
+
+
+def sample_graph(graph, damping_factor, n, walkers=WALKERS, burn_in=BURN_IN,
+                 seed=None):
+    """
+    Return array of PageRank values for each page of `graph`, estimated by
+    simulating `walkers` independent random surfers in parallel until `n`
+    pages have been sampled.
+
+    Each surfer starts on a random page and takes `burn_in` unsampled steps
+    first, so that the starting page doesn't bias the estimate. At every
+    step, with probability `damping_factor` a surfer follows a random link
+    from its page, or goes to a random page if its page has no links;
+    otherwise it goes to a random page.
+    """
+    rng = np.random.default_rng(seed)
+    pages = len(graph)
+    walkers = max(1, min(walkers, n))
+    steps = -(-n // walkers)
+
+    # Links sorted by source, so that the links from page p are
+    # targets[offsets[p]:offsets[p] + out_degree[p]]
+    indptr, targets = graph.out_links()
+    offsets = indptr[:-1]
+    last_link = max(len(targets) - 1, 0)
+
+    def advance(positions):
+        degree = graph.out_degree[positions]
+        follow = (rng.random(walkers) < damping_factor) & (degree > 0)
+        link = offsets[positions] + (rng.random(walkers) * degree).astype(np.int64)
+        linked = targets[np.minimum(link, last_link)] if len(targets) else positions
+        return np.where(follow, linked, rng.integers(0, pages, walkers))
+
+    positions = rng.integers(0, pages, walkers)
+    for _ in range(burn_in):
+        positions = advance(positions)
+
+    # Visited pages are buffered over several steps, so each count pass
+    # over all pages covers at least as many samples as there are pages
+    counts = np.zeros(pages, dtype=np.int64)
+    buffer = np.empty((max(1, min(steps, pages // walkers)), walkers), dtype=np.int64)
+    filled = 0
+    for _ in range(steps):
+        positions = advance(positions)
+        buffer[filled] = positions
+        filled += 1
+        if filled == len(buffer):
+            counts += np.bincount(buffer.ravel(), minlength=pages)
+            filled = 0
+    counts += np.bincount(buffer[:filled].ravel(), minlength=pages)
+
+    return counts / counts.sum()
+
+
+def surfer_pagerank(corpus, damping_factor, n, walkers=WALKERS,
+                    burn_in=BURN_IN, seed=None):
+    """
+    Return PageRank values for each page by sampling `n` pages with
+    many random surfers advanced in parallel.
+
+    Return a dictionary where keys are page names, and values are
+    their estimated PageRank value (a value between 0 and 1). All
+    PageRank values should sum to 1.
+    """
+    graph = LinkGraph.from_corpus(corpus)
+    ranks = sample_graph(graph, damping_factor, n, walkers, burn_in, seed)
+    return graph.ranks_dict(ranks)
+
+
+if __name__ == "__main__":
+    main()
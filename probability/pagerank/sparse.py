@@ -0,0 +1,425 @@
+import json
+import sys
+
+import numpy as np
+
+from pagerank import DAMPING, crawl
+
+TOLERANCE = 1e-10
+MAX_ITERATIONS = 1000
+EPSILON = 1e-12
+
+# Passes of local_update over more than 1 / DENSE_FRACTION of the pages
+# recompute every page instead
+DENSE_FRACTION = 4
+
+# Identifies files written by LinkGraph.save
+EDGES_MAGIC = b"PAGERANK-EDGES-1\n"
+
+
+def main():
+    if len(sys.argv) != 2:
+        sys.exit("Usage: python sparse.py corpus")
+    corpus = crawl(sys.argv[1])
+    ranks = sparse_pagerank(corpus, DAMPING)
+    print(f"PageRank Results from Sparse Power Iteration")
+    for page in sorted(ranks):
+        print(f"  {page}: {ranks[page]:.4f}")
+
+
+class LinkGraph():
+
+    def __init__(self, pages, sources, targets):
+        """
+        Create a link graph over `pages`, where page `sources[k]` links to
+        page `targets[k]`, both given as indices into `pages`.
+
+        Links are stored sorted by target and then by source in compressed
+        sparse row form: the pages linking to page `p` are
+        `self.sources[self.indptr[p]:self.indptr[p + 1]]`.
+        """
+        self.pages = list(pages)
+        n = len(self.pages)
+
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        keys = targets * (n + 1) + sources
+        if np.any(keys[1:] < keys[:-1]):
+            order = np.lexsort((sources, targets))
+            sources = sources[order]
+            targets = targets[order]
+        self.sources = sources
+        self.targets = targets
+        self.indptr = offsets(np.bincount(self.targets, minlength=n))
+
+        # Pages without links are treated as linking to every page
+        self.out_degree = np.bincount(self.sources, minlength=n)
+        self.dangling = self.out_degree == 0
+        self.link_weights = np.zeros(n)
+        self.link_weights[~self.dangling] = 1 / self.out_degree[~self.dangling]
+
+        # Links sorted by source and as a sparse matrix, built by
+        # `out_links` and `link_matrix` when first needed
+        self.out_indptr = None
+        self.out_targets = None
+        self.matrix = None
+
+    @classmethod
+    def from_corpus(cls, corpus):
+        """
+        Build a link graph from a corpus as returned by `crawl`.
+        """
+        pages = sorted(corpus)
+        ids = {page: k for k, page in enumerate(pages)}
+        sources = []
+        targets = []
+        for page in pages:
+            for link in corpus[page]:
+                sources.append(ids[page])
+                targets.append(ids[link])
+        return cls(pages, sources, targets)
+
+    def save(self, filename, metadata=None):
+        """
+        Write the graph to `filename` as a binary edge list with
+        `write_edges`, along with any `metadata`.
+        """
+        edges = np.stack([self.sources, self.targets], axis=1)
+        write_edges(filename, self.pages, [edges], len(edges), metadata)
+
+    @staticmethod
+    def read_edges(filename):
+        """
+        Return a tuple `(header, edges)` for a file written by `write_edges`,
+        where `edges` is a read-only memory map of the `(source, target)` pairs.
+        """
+        with open(filename, "rb") as f:
+            if f.read(len(EDGES_MAGIC)) != EDGES_MAGIC:
+                raise ValueError(f"{filename} is not an edge list")
+            size = int.from_bytes(f.read(8), "little")
+            header = json.loads(f.read(size))
+        if header["edges"] == 0:
+            return header, np.zeros((0, 2), dtype="<i8")
+        edges = np.memmap(
+            filename, dtype="<i8", mode="r",
+            offset=len(EDGES_MAGIC) + 8 + size,
+            shape=(header["edges"], 2)
+        )
+        return header, edges
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Load a graph written by `save`. Return a tuple `(graph, metadata)`.
+        """
+        header, edges = cls.read_edges(filename)
+        pages = header["pages"]
+        if isinstance(pages, int):
+            pages = range(pages)
+        graph = cls(pages, np.array(edges[:, 0]), np.array(edges[:, 1]))
+        return graph, header["metadata"]
+
+    def __len__(self):
+        return len(self.pages)
+
+    def step(self, ranks, damping_factor, teleport=None):
+        """
+        Return the ranks after one step of the random surfer from `ranks`,
+        which may also be a matrix with one column of ranks per surfer.
+
+        Surfers that don't follow a link jump to a page drawn from
+        `teleport` (with one column per surfer for a matrix of ranks), or
+        to a uniformly random page if `teleport` is None.
+        """
+        jump = 1 - damping_factor + damping_factor * ranks[self.dangling].sum(axis=0)
+        if teleport is None:
+            teleport = 1 / len(self)
+        return damping_factor * self.linked(ranks) + jump * teleport
+
+    def linked(self, ranks):
+        """
+        Return the rank arriving at each page along links from `ranks`,
+        which may also be a matrix with one column of ranks per surfer.
+        """
+        if ranks.ndim == 1:
+            return np.bincount(
+                self.targets,
+                weights=(ranks * self.link_weights)[self.sources],
+                minlength=len(self)
+            )
+        return self.link_matrix() @ ranks
+
+    def link_matrix(self):
+        """
+        Return a sparse matrix whose entry `(p, q)` is the probability of
+        a surfer on page `q` following a link to page `p`.
+        """
+        if self.matrix is None:
+            import scipy.sparse
+            self.matrix = scipy.sparse.csr_matrix(
+                (self.link_weights[self.sources], self.sources, self.indptr),
+                shape=(len(self), len(self))
+            )
+        return self.matrix
+
+    def out_links(self):
+        """
+        Return a tuple `(indptr, targets)` of the links sorted by source,
+        so that the pages linked to by page `p` are `targets[indptr[p]:indptr[p + 1]]`.
+        """
+        if self.out_indptr is None:
+            self.out_indptr = offsets(self.out_degree)
+            self.out_targets = self.link_keys() % (len(self) + 1)
+        return self.out_indptr, self.out_targets
+
+    def link_keys(self):
+        """
+        Return sorted array of `source * (N + 1) + target` for each link,
+        which orders links by source and then by target.
+        """
+        return np.sort(self.sources * (len(self) + 1) + self.targets)
+
+    def power_iteration(self, damping_factor, tolerance=TOLERANCE,
+                        max_iterations=MAX_ITERATIONS, initial=None,
+                        teleport=None):
+        """
+        Return array of PageRank values for each page, by power iteration
+        from `initial` ranks (uniform by default) until the L1 change
+        between iterations is below `tolerance`, or `max_iterations`
+        iterations have run.
+
+        If `teleport` is given, surfers jump to pages drawn from it rather
+        than uniformly, which gives personalized PageRank.
+        """
+        if initial is None:
+            ranks = np.full(len(self), 1 / len(self))
+        else:
+            ranks = np.asarray(initial, dtype=float)
+        for _ in range(max_iterations):
+            new_ranks = self.step(ranks, damping_factor, teleport)
+            residual = np.abs(new_ranks - ranks).sum()
+            ranks = new_ranks
+            if residual < tolerance:
+                break
+        return ranks
+
+    def local_update(self, ranks, damping_factor, epsilon=EPSILON,
+                     max_iterations=MAX_ITERATIONS, dirty=None):
+        """
+        Return a copy of `ranks` brought close to the PageRank of the graph
+        by only recomputing pages whose rank may have moved by more than
+        about `epsilon`.
+
+        The first pass recomputes the `dirty` pages (every page by
+        default). Each later pass recomputes only the pages linked to by
+        pages that moved in the pass before, so when `ranks` is already
+        close, as after a small edit to the graph, work stays around the
+        changed pages.
+        """
+        n = len(self)
+        out_indptr, out_targets = self.out_links()
+
+        # PageRank is the normalized solution of values = d * M values + 1,
+        # where M follows links only, so a change to a page's value only
+        # reaches the pages it links to, even for pages without links
+        ranks = np.asarray(ranks, dtype=float)
+        scale = n / (1 - damping_factor + damping_factor * ranks[self.dangling].sum())
+        values = ranks * scale
+        threshold = epsilon * scale
+
+        for _ in range(max_iterations):
+            if dirty is None or len(dirty) > n // DENSE_FRACTION:
+                # Cheaper to recompute every page than to gather its links,
+                # and a normalized step also moves rank through pages
+                # without links, which converges faster
+                new_ranks = self.step(values / values.sum(), damping_factor)
+                new_values = new_ranks * n / (
+                    1 - damping_factor + damping_factor * new_ranks[self.dangling].sum()
+                )
+                moved = np.flatnonzero(np.abs(new_values - values) > threshold)
+                values = new_values
+            elif len(dirty) > 0:
+                edges, counts = segments(self.indptr, dirty)
+                sources = self.sources[edges]
+                new_values = damping_factor * np.bincount(
+                    np.repeat(np.arange(len(dirty)), counts),
+                    weights=values[sources] * self.link_weights[sources],
+                    minlength=len(dirty)
+                ) + 1
+                moved = dirty[np.abs(new_values - values[dirty]) > threshold]
+                values[dirty] = new_values
+            else:
+                break
+
+            if len(moved) > n // DENSE_FRACTION:
+                dirty = None
+                continue
+            edges, _ = segments(out_indptr, moved)
+            affected = np.zeros(n, dtype=bool)
+            affected[out_targets[edges]] = True
+            dirty = np.flatnonzero(affected)
+
+        return values / values.sum()
+
+    def translate_pages(self, previous):
+        """
+        Return array mapping each page id of the `previous` graph to the
+        id of the same page in this graph, or N if it was removed.
+        """
+        if self.pages == previous.pages:
+            return np.arange(len(self))
+        ids = {page: k for k, page in enumerate(self.pages)}
+        return np.array(
+            [ids.get(page, len(self)) for page in previous.pages], dtype=np.int64
+        )
+
+    def changed_pages(self, previous):
+        """
+        Return array of the pages of this graph that are not in the
+        `previous` graph, or whose links differ from the previous graph.
+        """
+        n = len(self)
+        translate = np.append(self.translate_pages(previous), n)
+        old_sources = translate[previous.sources]
+        kept = old_sources < n
+        old_sources = old_sources[kept]
+        old_links = translate[previous.targets][kept] * (n + 1) + old_sources
+        if self.pages != previous.pages:
+            old_links.sort()
+
+        # Pages not in the previous graph, or with a different number of links
+        changed = np.bincount(old_sources, minlength=n) != self.out_degree
+        added = np.ones(n + 1, dtype=bool)
+        added[translate] = False
+        changed |= added[:-1]
+
+        # Both lists of links are sorted by target and then by source, so a
+        # stable sort merges them, and links in only one graph are unpaired
+        links = np.sort(
+            np.concatenate([old_links, self.targets * (n + 1) + self.sources]),
+            kind="stable"
+        )
+        unpaired = np.ones(len(links), dtype=bool)
+        paired = links[1:] == links[:-1]
+        unpaired[1:] &= ~paired
+        unpaired[:-1] &= ~paired
+        changed[links[unpaired] % (n + 1)] = True
+        return np.flatnonzero(changed)
+
+    def carry_ranks(self, previous, previous_ranks):
+        """
+        Return array of ranks for the pages of this graph, taking each
+        page's rank from `previous_ranks` of the `previous` graph, or
+        1 / N for new pages, normalized to sum to 1.
+        """
+        translate = self.translate_pages(previous)
+        kept = translate < len(self)
+        ranks = np.full(len(self), 1 / len(self))
+        ranks[translate[kept]] = np.asarray(previous_ranks)[kept]
+        return ranks / ranks.sum()
+
+    def ranks_dict(self, ranks):
+        """
+        Return dictionary mapping each page name to its value in `ranks`.
+        """
+        return dict(zip(self.pages, ranks.tolist()))
+
+
+def sparse_pagerank(corpus, damping_factor, tolerance=TOLERANCE):
+    """
+    Return PageRank values for each page in `corpus` by power iteration
+    over a sparse transition matrix, until the L1 change between
+    iterations is below `tolerance`.
+
+    Return a dictionary where keys are page names, and values are
+    their estimated PageRank value (a value between 0 and 1). All
+    PageRank values should sum to 1.
+    """
+    graph = LinkGraph.from_corpus(corpus)
+    return graph.ranks_dict(graph.power_iteration(damping_factor, tolerance))
+
+
+def incremental_pagerank(graph, previous, previous_ranks, damping_factor,
+                         tolerance=TOLERANCE, local=False, epsilon=EPSILON):
+    """
+    Return array of PageRank values for each page of `graph`, updated from
+    the `previous_ranks` computed for the `previous` graph.
+
+    Power iteration is warm-started from the previous ranks, so it only
+    has to converge past the effect of the changed pages. If `local` is
+    True, ranks are instead only recomputed around the changed pages, to
+    within about `epsilon` per page.
+    """
+    changed = graph.changed_pages(previous)
+    same_pages = graph.pages == previous.pages
+    if same_pages and len(changed) == 0:
+        return np.array(previous_ranks, dtype=float)
+    ranks = graph.carry_ranks(previous, previous_ranks)
+    if not local:
+        return graph.power_iteration(damping_factor, tolerance, initial=ranks)
+
+    # When only links changed, the first pages to move are those linked to
+    # by a changed page before or after the edit
+    dirty = None
+    if same_pages:
+        is_changed = np.zeros(len(graph), dtype=bool)
+        is_changed[changed] = True
+        affected = np.zeros(len(graph), dtype=bool)
+        for version in [previous, graph]:
+            affected[version.targets[is_changed[version.sources]]] = True
+        dirty = np.flatnonzero(affected)
+    return graph.local_update(ranks, damping_factor, epsilon, dirty=dirty)
+
+
+def write_edges(filename, pages, blocks, edges, metadata=None):
+    """
+    Write a binary edge list of `edges` links in total, given as an
+    iterable of `blocks` of `(source, target)` page id pairs, to `filename`.
+
+    The file holds `EDGES_MAGIC`, the length of a JSON header as an
+    8-byte little-endian integer, the header (with the page names, or the
+    number of pages if `pages` is an int and pages are named by their
+    ids, and any `metadata`), padding to a multiple of 8 bytes, and then
+    an array of little-endian int64 `(source, target)` pairs.
+    """
+    header = json.dumps({
+        "pages": pages if isinstance(pages, int) else list(pages),
+        "edges": edges,
+        "metadata": metadata
+    }).encode()
+    header += b" " * (-(len(EDGES_MAGIC) + 8 + len(header)) % 8)
+    written = 0
+    with open(filename, "wb") as f:
+        f.write(EDGES_MAGIC)
+        f.write(len(header).to_bytes(8, "little"))
+        f.write(header)
+        for block in blocks:
+            f.write(np.asarray(block, dtype="<i8").tobytes())
+            written += len(block)
+    if written != edges:
+        raise ValueError(f"expected {edges} edges, but {written} were written")
+
+
+def offsets(counts):
+    """
+    Return array of the running totals of `counts`, starting from 0.
+    """
+    totals = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=totals[1:])
+    return totals
+
+
+def segments(indptr, rows):
+    """
+    Return a tuple `(indices, counts)`, where `indices` concatenates
+    `range(indptr[row], indptr[row + 1])` for each of `rows` and `counts`
+    holds the length of each range.
+    """
+    starts = indptr[rows]
+    counts = indptr[rows + 1] - starts
+    shifts = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+    return shifts + np.arange(len(shifts)), counts
+
+
+if __name__ == "__main__":
+    main()